@@ -1,11 +1,328 @@
 from __future__ import annotations
-from collections.abc import Sequence
+from collections.abc import Sequence, Iterable, Iterator, Mapping
+from collections import OrderedDict
+import os
+import time
+import json
+import struct
+import hashlib
+import zipfile
+import functools
 import torch
 import numpy as np
+import pytomography
 from pytomography.utils import get_1d_gaussian_kernel
 
+_geometry_cache = OrderedDict()
+_geometry_cache_settings = {'maxsize': 16, 'cache_dir': None}
+# Version of the geometry table functions: must be incremented whenever a cached table changes, so that tables stored on disk by an older version are not reused
+_GEOMETRY_CACHE_VERSION = 2
+# Fields of the PET geometry information dictionary that the geometry tables depend on
+_GEOMETRY_FIELDS = (
+    'rsectorTransNr', 'rsectorAxialNr', 'moduleTransNr', 'moduleAxialNr', 'submoduleTransNr', 'submoduleAxialNr', 'crystalTransNr', 'crystalAxialNr',
+    'rsectorAxialSpacing', 'moduleTransSpacing', 'moduleAxialSpacing', 'submoduleTransSpacing', 'submoduleAxialSpacing', 'crystalTransSpacing', 'crystalAxialSpacing',
+    'radius', 'firstCrystalAxis', 'NrCrystalsPerRing', 'NrRings', 'min_rsector_difference',
+    'span', 'angular_mashing', 'max_ring_difference',
+)
+
+def set_geometry_cache(maxsize: int = 16, cache_dir: str | None = None) -> None:
+    """Configures the cache of geometry tables (``sinogram_coordinates``, ``sinogram_to_spatial``, ``get_scanner_LUT`` and ``get_axial_trans_ids_from_info``). Tables are built once per scanner configuration (keyed by ``get_geometry_hash``, which is precomputed for ``ScannerGeometry`` objects) and kept in memory; if ``cache_dir`` is provided they are also stored as ``.npz`` files, which are memory-mapped when loaded in later sessions.
+
+    Args:
+        maxsize (int, optional): Maximum number of tables kept in memory (least recently used tables are discarded first). Defaults to 16.
+        cache_dir (str | None, optional): Directory of the on-disk cache. If None, tables are only kept in memory. Defaults to None.
+    """
+    _geometry_cache_settings['maxsize'] = maxsize
+    _geometry_cache_settings['cache_dir'] = cache_dir
+    while len(_geometry_cache) > maxsize:
+        _geometry_cache.popitem(last=False)
+
+def clear_geometry_cache() -> None:
+    """Clears the in-memory cache of geometry tables (the on-disk cache is left untouched)
+    """
+    _geometry_cache.clear()
+
+def get_geometry_hash(info: dict) -> str:
+    """Obtains a stable hash of the geometry fields of a PET geometry information dictionary (the fields the geometry tables depend on; other fields are ignored). Two dictionaries with the same geometry fields yield the same hash (independent of key order).
+
+    Args:
+        info (dict): PET geometry information dictionary
+
+    Returns:
+        str: Hash of the geometry fields
+    """
+    if isinstance(info, ScannerGeometry):
+        return info.geometry_hash
+    fields = {}
+    for key, value in info.items():
+        if key not in _GEOMETRY_FIELDS:
+            continue
+        if isinstance(value, (bool, str)) or value is None:
+            fields[key] = value
+        elif isinstance(value, (int, float, np.number)):
+            fields[key] = float(value)
+        else:
+            fields[key] = str(value)
+    return hashlib.sha1(json.dumps(fields, sort_keys=True).encode()).hexdigest()
+
+class ScannerGeometry(Mapping):
+    """Immutable PET geometry that can be used wherever a PET geometry information dictionary ``info`` is accepted (it behaves as a read-only dictionary of the same fields). Its hash is computed once, so it is a cheap key for the geometry caches, and derived quantities and tables are computed lazily and kept with the object.
+
+    Args:
+        info (Mapping): PET geometry information dictionary
+    """
+    __slots__ = ('_fields', '_geometry_hash', '_derived')
+
+    def __init__(self, info: Mapping) -> None:
+        fields = dict(info)
+        object.__setattr__(self, '_fields', fields)
+        object.__setattr__(self, '_geometry_hash', get_geometry_hash(fields))
+        object.__setattr__(self, '_derived', {})
+
+    def __setattr__(self, name, value):
+        raise AttributeError('ScannerGeometry is immutable; use replace to obtain a modified copy')
+
+    def __delattr__(self, name):
+        raise AttributeError('ScannerGeometry is immutable; use replace to obtain a modified copy')
+
+    def __getitem__(self, key: str):
+        return self._fields[key]
+
+    def __iter__(self) -> Iterator:
+        return iter(self._fields)
+
+    def __len__(self) -> int:
+        return len(self._fields)
+
+    def __hash__(self) -> int:
+        return int(self._geometry_hash[:16], 16)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, ScannerGeometry):
+            return self._geometry_hash == other._geometry_hash
+        return Mapping.__eq__(self, other)
+
+    def __reduce__(self):
+        return (ScannerGeometry, (self._fields,))
+
+    def __repr__(self) -> str:
+        return f'ScannerGeometry({self._fields!r})'
+
+    def replace(self, **changes) -> ScannerGeometry:
+        """Obtains a copy of the geometry with some fields changed
+
+        Returns:
+            ScannerGeometry: Modified geometry
+        """
+        return ScannerGeometry({**self._fields, **changes})
+
+    def _get_derived(self, name: str, function):
+        """Computes a derived quantity once and keeps it with the object"""
+        if name not in self._derived:
+            self._derived[name] = function(self)
+        return self._derived[name]
+
+    @property
+    def geometry_hash(self) -> str:
+        """Hash of the geometry fields (see ``get_geometry_hash``)"""
+        return self._geometry_hash
+
+    @property
+    def nr_rings(self) -> int:
+        """Number of rings"""
+        return int(self['rsectorAxialNr'] * self['moduleAxialNr'] * self['submoduleAxialNr'] * self['crystalAxialNr'])
+
+    @property
+    def nr_crystals_per_ring(self) -> int:
+        """Number of crystals in each ring"""
+        return int(self['rsectorTransNr'] * self['moduleTransNr'] * self['submoduleTransNr'] * self['crystalTransNr'])
+
+    @property
+    def min_crystal_difference(self) -> int:
+        """Minimum difference between within-ring crystal IDs of a detector pair"""
+        return int(self['min_rsector_difference'] * self['moduleTransNr'] * self['submoduleTransNr'] * self['crystalTransNr'])
+
+    @property
+    def radial_size(self) -> int:
+        """Number of radial bins covered by crystal pairs"""
+        return int(self.nr_crystals_per_ring - 2 * (self.min_crystal_difference - 1) - 1)
+
+    @property
+    def sinogram_shape(self) -> tuple:
+        """Shape of the (non-TOF) sinogram (see ``get_sinogram_shape``)"""
+        return self._get_derived('sinogram_shape', get_sinogram_shape)
+
+    @property
+    def lor_coordinates(self) -> torch.Tensor:
+        """Sinogram coordinates of each crystal pair within a ring (see ``sinogram_coordinates``)"""
+        return self._get_derived('sinogram_coordinates', sinogram_coordinates)[0]
+
+    @property
+    def sinogram_index(self) -> torch.Tensor:
+        """Sinogram plane index of each ring pair (see ``sinogram_coordinates``)"""
+        return self._get_derived('sinogram_coordinates', sinogram_coordinates)[1]
+
+    @property
+    def scanner_LUT(self) -> torch.Tensor:
+        """Spatial coordinates of each detector (see ``get_scanner_LUT``)"""
+        return self._get_derived('scanner_LUT', get_scanner_LUT)
+
+def _load_npz_mmap(path: str) -> list[np.ndarray]:
+    """Helper function to the geometry cache: memory-maps all (uncompressed) arrays stored in a ``.npz`` file
+
+    Args:
+        path (str): Path to ``.npz`` file saved with ``np.savez``
+
+    Returns:
+        list[np.ndarray]: Memory-mapped arrays, in the order of their names
+    """
+    arrays = {}
+    with zipfile.ZipFile(path) as zf, open(path, 'rb') as f:
+        for member in zf.infolist():
+            if member.compress_type != zipfile.ZIP_STORED:
+                with np.load(path) as npz:
+                    return [npz[name] for name in sorted(npz.files)]
+            # Skip local file header to get to the .npy content
+            f.seek(member.header_offset)
+            header = f.read(30)
+            name_length, extra_length = struct.unpack('<HH', header[26:30])
+            f.seek(member.header_offset + 30 + name_length + extra_length)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            arrays[member.filename[:-4]] = np.memmap(path, dtype=dtype, mode='c', offset=f.tell(), shape=shape, order='F' if fortran_order else 'C')
+    return [arrays[name] for name in sorted(arrays)]
+
+def _cache_geometry_tables(num_tables: int):
+    """Decorator that memoizes functions ``function(info, *args)`` computing geometry tables. Results are keyed by the name of the function, the cache version, the hash of the geometry fields of ``info`` (see ``get_geometry_hash``) and the remaining arguments. Each call returns copies of the cached tables, so callers may modify them in place.
+
+    Args:
+        num_tables (int): Number of tensors returned by the function (if 1, a single tensor is returned rather than a tuple)
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(info, *args):
+            key = '_'.join([function.__name__, f'v{_GEOMETRY_CACHE_VERSION}', get_geometry_hash(info), *[str(arg) for arg in args]])
+            if key in _geometry_cache:
+                _geometry_cache.move_to_end(key)
+                tables = _geometry_cache[key]
+            else:
+                tables = None
+                cache_dir = _geometry_cache_settings['cache_dir']
+                path = None if cache_dir is None else os.path.join(cache_dir, f'{key}.npz')
+                if path is not None and os.path.exists(path):
+                    tables = tuple(torch.from_numpy(table) for table in _load_npz_mmap(path))
+                if tables is None:
+                    tables = function(info, *args)
+                    tables = tuple(tables) if num_tables > 1 else (tables,)
+                    if path is not None:
+                        os.makedirs(cache_dir, exist_ok=True)
+                        path_temp = f'{path[:-4]}_{os.getpid()}.tmp.npz'
+                        np.savez(path_temp, **{f'table_{i:02d}': table.cpu().numpy() for i, table in enumerate(tables)})
+                        os.replace(path_temp, path)
+                _geometry_cache[key] = tables
+                while len(_geometry_cache) > _geometry_cache_settings['maxsize']:
+                    _geometry_cache.popitem(last=False)
+            tables = tuple(table.clone() for table in tables)
+            return tables if num_tables > 1 else tables[0]
+        return wrapper
+    return decorator
+
+def _get_lor_angular_radial(
+    nr_crystals_per_ring: int,
+    distance_crystal_id_0_to_first_sector_center: float,
+    min_crystal_difference: int
+    ) -> Sequence[np.ndarray]:
+    """Helper function to ``sinogram_coordinates`` and ``sinogram_to_spatial``: computes the angular and radial sinogram coordinates of every pair of crystals within a ring
+
+    Args:
+        nr_crystals_per_ring (int): Number of crystals in each ring
+        distance_crystal_id_0_to_first_sector_center (float): Offset between crystal 0 and the first rsector's center
+        min_crystal_difference (int): Minimum difference between crystal IDs for a pair to be considered
+
+    Returns:
+        Sequence[np.ndarray]: Angular coordinates, radial coordinates (floored), and a mask of the crystal pairs considered. Each has shape [N_crystals_per_ring, N_crystals_per_ring].
+    """
+    crystal_ids = np.arange(nr_crystals_per_ring) % nr_crystals_per_ring - distance_crystal_id_0_to_first_sector_center
+    crystal_ids = np.where(crystal_ids < 0, crystal_ids + nr_crystals_per_ring, crystal_ids)
+    id_a = np.minimum(crystal_ids[:,None], crystal_ids[None,:])
+    id_b = np.maximum(crystal_ids[:,None], crystal_ids[None,:])
+    valid = id_b - id_a >= min_crystal_difference
+    lower_half = id_a + id_b < nr_crystals_per_ring / 2
+    upper_half = id_a + id_b >= (3 * nr_crystals_per_ring) / 2
+    radial_outer = np.where(id_a == id_b, -nr_crystals_per_ring / 2, ((id_b - id_a - 1) / 2) - ((nr_crystals_per_ring - (id_b - id_a + 1)) / 2))
+    radial_inner = np.where(id_a == id_b, nr_crystals_per_ring / 2, ((nr_crystals_per_ring - (id_b - id_a + 1)) / 2) - ((id_b - id_a - 1) / 2))
+    radial = np.floor(np.where(upper_half | lower_half, radial_outer, radial_inner))
+    angular = np.where(lower_half, (2 * id_a + nr_crystals_per_ring + radial) / 2, np.where(upper_half, (2 * id_a - nr_crystals_per_ring + radial) / 2, (2 * id_a - radial) / 2))
+    return angular, radial, valid
+
+def _get_michelogram_index(nr_rings: int) -> np.ndarray:
+    r"""Helper function to ``sinogram_coordinates`` and ``sinogram_to_spatial``: computes the sinogram plane index of every ring pair in closed form. Planes are ordered by ring difference :math:`d`; for :math:`d>0` the first plane has index :math:`N + \sum_{k=1}^{d-1} 2(N-k) = N + 2(d-1)N - (d-1)d` (1-based), where :math:`N` is the number of rings.
+
+    Args:
+        nr_rings (int): Number of rings
+
+    Returns:
+        np.ndarray: Sinogram plane index of shape [Nrings, Nrings]
+    """
+    ring1 = np.arange(1, nr_rings+1)[:,None]
+    ring2 = np.arange(1, nr_rings+1)[None,:]
+    ring_difference = np.abs(ring2 - ring1)
+    first_sinogram_index = nr_rings + 2 * (ring_difference - 1) * nr_rings - (ring_difference - 1) * ring_difference
+    sinogram_index = np.where(
+        ring_difference == 0,
+        ring1,
+        np.where(ring1 < ring2, first_sinogram_index + ring1, first_sinogram_index + nr_rings - ring_difference + ring1 - ring_difference)
+    )
+    return sinogram_index - 1
+
+def _get_span_plane_index(nr_rings: int, span: int = 1, max_ring_difference: int | None = None) -> np.ndarray:
+    r"""Helper function to ``sinogram_coordinates``: computes the (axially compressed) sinogram plane index of every ring pair. Ring pairs are grouped into segments of ``span`` consecutive ring differences (segment 0 contains ring differences :math:`|d| \leq (\text{span}-1)/2`); within a segment, ring pairs with the same ring sum share a plane. Segments are ordered 0, +1, -1, +2, -2, ... and planes within a segment by ring sum, so that a span of 1 yields the same ordering as ``_get_michelogram_index``.
+
+    Args:
+        nr_rings (int): Number of rings
+        span (int, optional): Axial compression factor (must be odd). Defaults to 1.
+        max_ring_difference (int | None, optional): Maximum ring difference considered. Ring pairs beyond it are assigned an index of -1. If None, all ring differences are used. Defaults to None.
+
+    Returns:
+        np.ndarray: Sinogram plane index of shape [Nrings, Nrings]
+    """
+    if span < 1 or span % 2 == 0:
+        raise ValueError(f'span must be a positive odd integer, got {span}')
+    ring1 = np.arange(nr_rings)[:,None]
+    ring2 = np.arange(nr_rings)[None,:]
+    ring_difference = ring2 - ring1
+    segment = (np.abs(ring_difference) + (span - 1) // 2) // span
+    segment_order = np.where(segment == 0, 0, 2 * segment - (ring_difference > 0))
+    key = segment_order * 2 * nr_rings + ring1 + ring2
+    valid = np.ones(key.shape, dtype=bool) if max_ring_difference is None else np.abs(ring_difference) <= max_ring_difference
+    sinogram_index = np.full(key.shape, -1, dtype=np.int64)
+    sinogram_index[valid] = np.unique(key[valid], return_inverse=True)[1].ravel()
+    return sinogram_index
+
+def get_compressed_info(info: dict, span: int = 1, angular_mashing: int = 1, max_ring_difference: int | None = None) -> dict:
+    """Obtains a copy of a PET geometry information dictionary with sinogram compression options. Passing the returned dictionary to ``listmode_to_sinogram``, ``sinogram_to_listmode``, ``sinogram_coordinates`` or ``smooth_randoms_sinogram`` uses axially compressed (span) and angularly mashed sinograms.
+
+    Args:
+        info (dict): PET geometry information dictionary
+        span (int, optional): Axial compression factor (must be odd). Defaults to 1.
+        angular_mashing (int, optional): Number of adjacent angular bins combined into one (must divide the number of angular bins). Defaults to 1.
+        max_ring_difference (int | None, optional): Maximum ring difference considered. If None, all ring differences are used. Defaults to None.
+
+    Returns:
+        dict: PET geometry information dictionary with compression options (a ``ScannerGeometry`` if ``info`` is one)
+    """
+    if int(info['NrCrystalsPerRing']/2) % angular_mashing != 0:
+        raise ValueError(f'angular_mashing must divide the number of angular bins ({int(info["NrCrystalsPerRing"]/2)}), got {angular_mashing}')
+    _get_span_plane_index(1, span)
+    compressed_info = {**info, 'span': span, 'angular_mashing': angular_mashing, 'max_ring_difference': max_ring_difference}
+    return ScannerGeometry(compressed_info) if isinstance(info, ScannerGeometry) else compressed_info
+
+@_cache_geometry_tables(num_tables=2)
 def sinogram_coordinates(info: dict) -> Sequence[torch.Tensor]:
-    """Obtains two tensors: the first yields the sinogram coordinates (r/theta) given two crystal IDs (shape [N_crystals_per_ring, N_crystals_per_ring, 2]), the second yields the sinogram index given two ring IDs (shape [Nrings, Nrings])
+    """Obtains two tensors: the first yields the sinogram coordinates (r/theta) given two crystal IDs (shape [N_crystals_per_ring, N_crystals_per_ring, 2]), the second yields the sinogram index given two ring IDs (shape [Nrings, Nrings]). If ``info`` contains compression options (see ``get_compressed_info``), the angular coordinate is mashed and the sinogram index is axially compressed (ring pairs beyond the maximum ring difference have an index of -1).
 
     Args:
         info (dict): PET geometry information dictionary    
@@ -26,75 +343,22 @@ def sinogram_coordinates(info: dict) -> Sequence[torch.Tensor]:
     lor_coordinates = np.zeros((nr_crystals_per_ring, nr_crystals_per_ring, 2)) # store (angular, radial) values for each crystal pair (LOR)
     
     # compute the radial and angular sinogram coordinates for each possible detector pair.
-    for full_ring_crystal_id_1 in range(nr_crystals_per_ring):
-        crystal_id_1 = (full_ring_crystal_id_1 % nr_crystals_per_ring) - distance_crystal_id_0_to_first_sector_center
-        if crystal_id_1 < 0:
-                crystal_id_1 += nr_crystals_per_ring
-        for full_ring_crystal_id_2 in range(nr_crystals_per_ring):
-            crystal_id_2 = (full_ring_crystal_id_2 % nr_crystals_per_ring) - distance_crystal_id_0_to_first_sector_center
-            if crystal_id_2 < 0:
-                crystal_id_2 += nr_crystals_per_ring
-            id_a = 0
-            id_b = 0
-            if crystal_id_1 < crystal_id_2:
-                id_a = crystal_id_1
-                id_b = crystal_id_2
-            else:
-                id_a = crystal_id_2
-                id_b = crystal_id_1
-            radial = 0
-            angular = 0
-            if id_b - id_a < min_crystal_difference:
-                continue
-            else:
-                if id_a + id_b >= (3 * nr_crystals_per_ring) / 2 or id_a + id_b < nr_crystals_per_ring / 2:
-                    if id_a == id_b:
-                        radial = -nr_crystals_per_ring / 2
-                    else:
-                        radial = ((id_b - id_a - 1) / 2) - ((nr_crystals_per_ring - (id_b - id_a + 1)) / 2)
-                else:
-                    if id_a == id_b:
-                        radial = nr_crystals_per_ring / 2
-                    else:
-                        radial = ((nr_crystals_per_ring - (id_b - id_a + 1)) / 2) - ((id_b - id_a - 1) / 2)
-
-                radial = np.floor(radial)
-
-                if id_a + id_b < nr_crystals_per_ring / 2:
-                    angular = (2 * id_a + nr_crystals_per_ring + radial) / 2
-                else:
-                    if id_a + id_b >= (3 * nr_crystals_per_ring) / 2:
-                        angular = (2 * id_a - nr_crystals_per_ring + radial) / 2
-                    else:
-                        angular = (2 * id_a - radial) / 2
-                lor_coordinates[full_ring_crystal_id_1, full_ring_crystal_id_2, 0] = np.floor(angular)
-                lor_coordinates[full_ring_crystal_id_1, full_ring_crystal_id_2, 1] = np.floor(radial + radial_size / 2)
-    sinogram_index = np.zeros((nr_rings, nr_rings))
-    for ring1 in range(1, nr_rings+1):
-        for ring2 in range(1, nr_rings+1):
-            ring_difference = abs(ring2 - ring1)
-            if ring_difference == 0:
-                current_sinogram_index = ring1
-            else:
-                current_sinogram_index = nr_rings
-                if ring1 < ring2:
-                    if ring_difference > 1:
-                        for ring_distance in range(1, ring_difference):
-                            current_sinogram_index += 2 * (nr_rings - ring_distance)
-                    current_sinogram_index += ring1
-                else:
-                    if ring_difference > 1:
-                        for ring_distance in range(1, ring_difference):
-                            current_sinogram_index += 2 * (nr_rings - ring_distance)
-                    current_sinogram_index += nr_rings - ring_difference + ring1 - ring_difference
-            sinogram_index[ring1-1, ring2-1] = current_sinogram_index - 1
+    angular, radial, valid = _get_lor_angular_radial(nr_crystals_per_ring, distance_crystal_id_0_to_first_sector_center, min_crystal_difference)
+    lor_coordinates[valid, 0] = np.floor(angular[valid])
+    lor_coordinates[valid, 1] = np.floor(radial[valid] + radial_size / 2)
+    lor_coordinates[..., 0] = np.floor_divide(lor_coordinates[..., 0], info.get('angular_mashing', 1))
+    if info.get('span', 1) == 1 and info.get('max_ring_difference') is None:
+        sinogram_index = _get_michelogram_index(nr_rings)
+    else:
+        sinogram_index = _get_span_plane_index(nr_rings, info.get('span', 1), info.get('max_ring_difference'))
     return torch.tensor(lor_coordinates).to(torch.long), torch.tensor(sinogram_index).to(torch.long)
 
 # computes the inverse mapping:
 # From sinogram bins (angular, radial) → back to detector coordinates (x1, y1, x2, y2)
 # From ring pairs → to z-coordinates (z1, z2)
+@_cache_geometry_tables(num_tables=2)
 def sinogram_to_spatial(info: dict) -> Sequence[torch.Tensor]:
-    """Returns two tensors: the first yields the detector coordinates (x1/y1/x2/y2) of each of the two crystals given the element of the sinogram (shape [N_crystals_per_ring, N_crystals_per_ring, 2, 2]), the second yields the ring coordinates (z1/z2) given two ring IDs (shape [Nrings*Nrings, 2])
+    """Returns two tensors: the first yields the detector coordinates (x1/y1/x2/y2) of each of the two crystals given the element of the sinogram (shape [N_crystals_per_ring, N_crystals_per_ring, 2, 2]), the second yields the ring coordinates (z1/z2) given two ring IDs (shape [Nrings*Nrings, 2]). Sinogram compression options in ``info`` are ignored (coordinates are always given for uncompressed sinograms).
 
     Args:
         info (dict): PET geometry information dictionary
@@ -102,7 +366,7 @@ def sinogram_to_spatial(info: dict) -> Sequence[torch.Tensor]:
     Returns:
         Sequence[torch.Tensor]: Two tensors yielding spatial coordinates
     """
-    scanner_lut = get_scanner_LUT(info) # LUT maps each crystal ID to its 3D spatial coordinates (x, y, z).
+    scanner_lut = get_scanner_LUT(info).cpu().numpy() # LUT maps each crystal ID to its 3D spatial coordinates (x, y, z).
     # CHANGED - ADDED SUBMODULE
     nr_sectors_trans, nr_sectors_axial, nr_modules_axial, nr_modules_trans, nr_submodules_axial, nr_submodules_trans, nr_crystals_trans, nr_crystals_axial = info['rsectorTransNr'], info['rsectorAxialNr'], info['moduleAxialNr'], info['moduleTransNr'], info['submoduleAxialNr'], info['submoduleTransNr'], info['crystalTransNr'], info['crystalAxialNr']
     nr_rings = nr_sectors_axial * nr_modules_axial * nr_submodules_axial * nr_crystals_axial # CHANGED
@@ -115,170 +379,524 @@ def sinogram_to_spatial(info: dict) -> Sequence[torch.Tensor]:
     distance_crystal_id_0_to_first_sector_center = (nr_modules_trans * nr_submodules_trans * nr_crystals_trans) / 2 # CHANGED
     detector_coordinates = np.zeros((angular_size, radial_size, 2, 2), dtype=np.float32) # [N_angular_bins, N_radial_bins, 2 detectors, 2 coordinates (x/y)]
     # Generates first the coordinates on each sinogram
-    for full_ring_crystal_id_1 in range(nr_crystals_per_ring):
-        crystal_id_1 = full_ring_crystal_id_1 % nr_crystals_per_ring - distance_crystal_id_0_to_first_sector_center
-        if crystal_id_1 < 0:
-            crystal_id_1 += nr_crystals_per_ring
-        for full_ring_crystal_id_2 in range(nr_crystals_per_ring):
-            crystal_id_2 = full_ring_crystal_id_2 % nr_crystals_per_ring - distance_crystal_id_0_to_first_sector_center
-            if crystal_id_2 < 0:
-                crystal_id_2 += nr_crystals_per_ring
-            id_a = 0
-            id_b = 0
-            if crystal_id_1 < crystal_id_2:
-                id_a = crystal_id_1
-                id_b = crystal_id_2
-            else:
-                id_a = crystal_id_2
-                id_b = crystal_id_1
-            radial = 0
-            angular = 0
-            if id_b - id_a < min_crystal_difference:
-                continue
-            else:
-                if id_a + id_b >= (3 * nr_crystals_per_ring) / 2 or id_a + id_b < nr_crystals_per_ring / 2:
-                    if id_a == id_b:
-                        radial = -nr_crystals_per_ring / 2
-                    else:
-                        radial = ((id_b - id_a - 1) / 2) - ((nr_crystals_per_ring - (id_b - id_a + 1)) / 2)
-                else:
-                    if id_a == id_b:
-                        radial = nr_crystals_per_ring / 2
-                    else:
-                        radial = ((nr_crystals_per_ring - (id_b - id_a + 1)) / 2) - ((id_b - id_a - 1) / 2)
-                radial = np.floor(radial)
-                if id_a + id_b < nr_crystals_per_ring / 2:
-                    angular = (2 * id_a + nr_crystals_per_ring + radial) / 2
-                else:
-                    if id_a + id_b >= (3 * nr_crystals_per_ring) / 2:
-                        angular = (2 * id_a - nr_crystals_per_ring + radial) / 2
-                    else:
-                        angular = (2 * id_a - radial) / 2
-                if full_ring_crystal_id_1 >= full_ring_crystal_id_2:
-                    detector_coordinates[int(np.floor(angular)), int(np.floor(radial + radial_size / 2)), 0, :] = scanner_lut[full_ring_crystal_id_1, 0:2]
-                    detector_coordinates[int(np.floor(angular)), int(np.floor(radial + radial_size / 2)), 1, :] = scanner_lut[full_ring_crystal_id_2, 0:2]
+    angular, radial, valid = _get_lor_angular_radial(nr_crystals_per_ring, distance_crystal_id_0_to_first_sector_center, min_crystal_difference)
+    full_ring_crystal_id_1, full_ring_crystal_id_2 = np.nonzero(valid * (np.arange(nr_crystals_per_ring)[:,None] >= np.arange(nr_crystals_per_ring)[None,:]))
+    idx_angular = np.floor(angular[full_ring_crystal_id_1, full_ring_crystal_id_2]).astype(np.int64) % angular_size
+    idx_radial = np.floor(radial[full_ring_crystal_id_1, full_ring_crystal_id_2] + radial_size / 2).astype(np.int64) % radial_size
+    # Several crystal pairs map to the same sinogram bin: keep the last one in crystal ID order
+    _, idx_last_reversed = np.unique((idx_angular * radial_size + idx_radial)[::-1], return_index=True)
+    idx_last = len(idx_angular) - 1 - idx_last_reversed
+    detector_coordinates[idx_angular[idx_last], idx_radial[idx_last], 0, :] = scanner_lut[full_ring_crystal_id_1[idx_last], 0:2]
+    detector_coordinates[idx_angular[idx_last], idx_radial[idx_last], 1, :] = scanner_lut[full_ring_crystal_id_2[idx_last], 0:2]
     ring_coordinates = np.zeros((nr_rings * nr_rings, 2), dtype=np.float32)
-    for ring1 in range(1, nr_rings+1):
-        for ring2 in range(1, nr_rings+1):
-            ring_difference = abs(ring2 - ring1)
-            if ring_difference == 0:
-                current_sinogram_index = ring1
-            else:
-                current_sinogram_index = nr_rings
-                if ring1 < ring2:
-                    if ring_difference > 1:
-                        for ring_distance in range(1, ring_difference):
-                            current_sinogram_index += 2 * (nr_rings - ring_distance)
-                    current_sinogram_index += ring1
-                else:
-                    if ring_difference > 1:
-                        for ring_distance in range(1, ring_difference):
-                            current_sinogram_index += 2 * (nr_rings - ring_distance)
-                    current_sinogram_index += nr_rings - ring_difference + ring1 - ring_difference
-            ring_coordinates[current_sinogram_index-1, 0] = scanner_lut[info['NrCrystalsPerRing']*(ring1-1), 2]
-            ring_coordinates[current_sinogram_index-1, 1] = scanner_lut[info['NrCrystalsPerRing']*(ring2-1), 2]
+    ring_z = scanner_lut[info['NrCrystalsPerRing'] * np.arange(nr_rings), 2]
+    sinogram_index = _get_michelogram_index(nr_rings)
+    ring_coordinates[sinogram_index.ravel(), 0] = np.repeat(ring_z, nr_rings)
+    ring_coordinates[sinogram_index.ravel(), 1] = np.tile(ring_z, nr_rings)
     return torch.tensor(detector_coordinates).to(torch.float32), torch.tensor(ring_coordinates).to(torch.float32)
 
 
-def listmode_to_sinogram(
+@_cache_geometry_tables(num_tables=1)
+def get_lor_bin_index(info: dict) -> torch.Tensor:
+    """Obtains the flattened (angular, radial) sinogram bin index of every pair of crystals within a ring (shape [N_crystals_per_ring, N_crystals_per_ring]). Crystal pairs closer than the minimum rsector difference, or that fall outside of the sinogram, are assigned an index of -1.
+
+    Args:
+        info (dict): PET geometry information dictionary
+
+    Returns:
+        torch.Tensor: Flattened angular/radial bin index lookup tensor
+    """
+    lor_coordinates, _ = sinogram_coordinates(info)
+    angular_size, radial_size = get_sinogram_shape(info)[:2]
+    angular, radial = lor_coordinates[...,0], lor_coordinates[...,1]
+    nr_crystals_per_sector = info['moduleTransNr'] * info['submoduleTransNr'] * info['crystalTransNr']
+    _, _, valid_pair = _get_lor_angular_radial(info['NrCrystalsPerRing'], nr_crystals_per_sector / 2, info['min_rsector_difference'] * nr_crystals_per_sector)
+    valid = torch.from_numpy(valid_pair)*(angular>=0)*(angular<angular_size)*(radial>=0)*(radial<radial_size)
+    return torch.where(valid, angular*radial_size + radial, -1)
+
+def _get_listmode_bin_components(
     detector_ids: torch.Tensor,
     info: dict,
-    weights: torch.Tensor = None,
-    normalization: bool = False,
-    tof_meta: PETTOFMeta = None
-    ) -> torch.Tensor:
-    """Converts PET listmode data to sinogram
+    num_tof_bins: int | None = None,
+    reverse: bool = False
+    ) -> Sequence[torch.Tensor | None]:
+    """Helper function to ``_get_sinogram_bin_index`` and ``ListmodeBinIndex``: obtains the flattened (angular, radial, plane) sinogram bin index and the TOF bin of each listmode event. Events that fall outside of the sinogram are assigned an index of -1.
 
     Args:
         detector_ids (torch.Tensor): Listmode detector ID data
         info (dict): PET geometry information dictionary
-        weights (torch.Tensor, optional): Binning weights for each listmode event. Defaults to None.
-        normalization (bool, optional): Whether or not this is a normalization sinogram (need to do some extra steps). Defaults to False.
-        tof_meta (PETTOFMeta, optional): PET TOF metadata. Defaults to None.
+        num_tof_bins (int | None, optional): Number of TOF bins. If None, the TOF dimension is not considered. Defaults to None.
+        reverse (bool, optional): Bin the detector pair in opposite order (used for normalization sinograms). Defaults to False.
 
     Returns:
-        torch.Tensor: PET sinogram
+        Sequence[torch.Tensor | None]: Flattened spatial sinogram bin index and TOF bin (None if TOF is not considered) of each event
     """
-    if tof_meta is not None: # if tof_meta is provided
-        return _listmodeTOF_to_sinogramTOF(detector_ids, info, tof_meta, weights=weights)
-    lor_coordinates, sinogram_index = sinogram_coordinates(info)
-    detector_ids = detector_ids[:,:2] 
-    within_ring_id = (detector_ids % info['NrCrystalsPerRing']).to(torch.long)
-    ring_ids = (detector_ids // info['NrCrystalsPerRing']).to(torch.long)
+    _, sinogram_index = sinogram_coordinates(info)
+    lor_bin_index = get_lor_bin_index(info)
+    within_ring_id = (detector_ids[:,:2] % info['NrCrystalsPerRing']).to(torch.long)
+    ring_ids = (detector_ids[:,:2] // info['NrCrystalsPerRing']).to(torch.long)
     # Need to bin by largest "within_ring_id" first (for use with the "ring_coordinates" function yielding spatial coordinates for each ID-pair at each sinogram coordinate)
     within_ring_id, idx = within_ring_id.sort(axis=1, descending=True)
     ring_ids = ring_ids.gather(index=idx, dim=1)
-    # Bin sinogram
-    bin_edges = [
-        torch.arange(int(info['NrCrystalsPerRing']/2)+1).to(torch.float32)-0.5,
-        torch.arange(int(info['NrCrystalsPerRing'])+2).to(torch.float32)-0.5,
-        torch.arange(int(info['NrRings']**2)+1).to(torch.float32)-0.5   # 
-    ]
-    sinogram = torch.histogramdd(
-        torch.concatenate([lor_coordinates[within_ring_id[:,0], within_ring_id[:,1]], sinogram_index[ring_ids[:,0], ring_ids[:,1]].unsqueeze(1)], dim=-1).to(torch.float32),
-        bin_edges,
-        weight=weights
-    )[0] # CHANGED
-    # Opposite binning for normalization sinogram, which always considers "ring_id"s in order (this only works because of +/- z symmetry of normalization factors)
-    if normalization:
-        sinogram += torch.histogramdd(
-            torch.concatenate([lor_coordinates[within_ring_id[:,1], within_ring_id[:,0]], sinogram_index[ring_ids[:,1], ring_ids[:,0]].unsqueeze(1)], dim=-1).to(torch.float32),
-            bin_edges,
-            weight=weights
-        )[0]
-        sinogram /= 2
-    return sinogram
+    i, j = (1, 0) if reverse else (0, 1)
+    bin_index = lor_bin_index[within_ring_id[:,i], within_ring_id[:,j]]
+    plane_index = sinogram_index[ring_ids[:,i], ring_ids[:,j]]
+    bin_index = torch.where((bin_index>=0)*(plane_index>=0), bin_index * get_sinogram_shape(info)[2] + plane_index, -1)
+    if num_tof_bins is None:
+        return bin_index, None
+    TOF_bins = detector_ids[:,2].to(torch.long)
+    # Opposite detector order
+    TOF_bins = torch.where(idx[:,0]==1, num_tof_bins - 1 - TOF_bins, TOF_bins)
+    # Only consider events within TOF range
+    TOF_bins = torch.where((TOF_bins>=0)*(TOF_bins<num_tof_bins), TOF_bins, -1)
+    return bin_index, TOF_bins
+
+def _combine_bin_components(bin_index: torch.Tensor, TOF_bins: torch.Tensor | None, num_tof_bins: int | None) -> torch.Tensor:
+    """Helper function to ``_get_sinogram_bin_index`` and ``ListmodeBinIndex``: combines spatial sinogram bin indices and TOF bins into flattened (angular, radial, plane[, TOF]) sinogram bin indices
 
-def _listmodeTOF_to_sinogramTOF(
+    Args:
+        bin_index (torch.Tensor): Flattened spatial sinogram bin index of each event (-1 if outside of the sinogram)
+        TOF_bins (torch.Tensor | None): TOF bin of each event (-1 if outside of the TOF range)
+        num_tof_bins (int | None): Number of TOF bins. If None, the TOF dimension is not considered.
+
+    Returns:
+        torch.Tensor: Flattened sinogram bin index of each event
+    """
+    bin_index = bin_index.to(torch.long)
+    if num_tof_bins is None:
+        return bin_index
+    TOF_bins = TOF_bins.to(torch.long)
+    return torch.where((bin_index>=0)*(TOF_bins>=0), bin_index * num_tof_bins + TOF_bins, -1)
+
+def _get_sinogram_bin_index(
     detector_ids: torch.Tensor,
     info: dict,
-    tof_meta: PETTOFMeta,
-    weights: torch.Tensor | None = None
+    tof_meta: PETTOFMeta | None = None,
+    reverse: bool = False
     ) -> torch.Tensor:
-    """Helper function to ``listmode_to_sinogram`` for TOF data
+    """Helper function to ``listmode_to_sinogram``: obtains the flattened (angular, radial, plane[, TOF]) sinogram bin index of each listmode event. Events that fall outside of the sinogram are assigned an index of -1.
 
     Args:
         detector_ids (torch.Tensor): Listmode detector ID data
         info (dict): PET geometry information dictionary
-        weights (torch.Tensor, optional): Binning weights for each listmode event. Defaults to None.
+        tof_meta (PETTOFMeta | None, optional): PET TOF metadata. If None, the TOF dimension is not considered. Defaults to None.
+        reverse (bool, optional): Bin the detector pair in opposite order (used for normalization sinograms). Defaults to False.
+
+    Returns:
+        torch.Tensor: Flattened sinogram bin index of each event
+    """
+    num_tof_bins = None if tof_meta is None else tof_meta.num_bins
+    return _combine_bin_components(*_get_listmode_bin_components(detector_ids, info, num_tof_bins, reverse), num_tof_bins)
+
+class ListmodeBinIndex:
+    """Sinogram bin index of each event of a listmode event list. Computing it once and passing it in place of the detector IDs to ``listmode_to_sinogram`` and ``sinogram_to_listmode`` avoids repeating the crystal sorting and lookups for every transfer between listmode and sinogram space. Indices are stored as int32 (spatial bins) and int16 (TOF bins).
+
+    Args:
+        detector_ids (torch.Tensor | np.ndarray | Iterable): Listmode detector ID data (array-like or iterable of chunks, see ``listmode_to_sinogram_streaming``)
+        info (dict): PET geometry information dictionary
+        tof_meta (PETTOFMeta | None, optional): PET TOF metadata. If provided, the TOF bin of each event is also stored. Defaults to None.
+        chunk_size (int, optional): Number of events processed at a time. Defaults to 10000000.
+    """
+    def __init__(
+        self,
+        detector_ids: torch.Tensor | np.ndarray | Iterable,
+        info: dict,
+        tof_meta: PETTOFMeta | None = None,
+        chunk_size: int = 10000000
+        ) -> None:
+        self.info = info
+        self.num_tof_bins = None if tof_meta is None else tof_meta.num_bins
+        dtype = torch.int32 if np.prod(get_sinogram_shape(info)) < 2**31 else torch.int64
+        bin_index, TOF_bins = [], []
+        for detector_ids_chunk in _iterate_listmode_chunks(detector_ids, chunk_size):
+            bin_index_chunk, TOF_bins_chunk = _get_listmode_bin_components(detector_ids_chunk, info, self.num_tof_bins)
+            bin_index.append(bin_index_chunk.to(dtype))
+            if TOF_bins_chunk is not None:
+                TOF_bins.append(TOF_bins_chunk.to(torch.int16))
+        self.bin_index = torch.cat(bin_index) if bin_index else torch.zeros(0, dtype=dtype)
+        self.TOF_bins = torch.cat(TOF_bins) if self.num_tof_bins is not None else None
+
+    def __len__(self) -> int:
+        return self.bin_index.shape[0]
+
+    def get_sinogram_bin_index(self, TOF: bool = False, start: int = 0, stop: int | None = None) -> torch.Tensor:
+        """Obtains the flattened sinogram bin index of a range of events (-1 for events outside of the sinogram)
+
+        Args:
+            TOF (bool, optional): Whether or not to index a TOF sinogram. Defaults to False.
+            start (int, optional): First event. Defaults to 0.
+            stop (int | None, optional): Last event (exclusive). If None, all remaining events are used. Defaults to None.
+
+        Returns:
+            torch.Tensor: Flattened sinogram bin index of each event
+        """
+        if TOF and self.TOF_bins is None:
+            raise ValueError('ListmodeBinIndex was computed without tof_meta and cannot index a TOF sinogram')
+        TOF_bins = self.TOF_bins[start:stop] if TOF else None
+        return _combine_bin_components(self.bin_index[start:stop], TOF_bins, self.num_tof_bins if TOF else None)
+
+def _accumulate_sinogram(
+    bin_index: torch.Tensor,
+    sinogram: torch.Tensor,
+    weights: torch.Tensor | None = None
+    ) -> torch.Tensor:
+    """Helper function to ``listmode_to_sinogram``: accumulates listmode events (in place) into their bins of a flattened sinogram
+
+    Args:
+        bin_index (torch.Tensor): Flattened sinogram bin index of each event (events with an index of -1 are ignored)
+        sinogram (torch.Tensor): Flattened sinogram to which events are added
+        weights (torch.Tensor | None, optional): Binning weights for each listmode event. Defaults to None.
+
+    Returns:
+        torch.Tensor: Flattened sinogram
+    """
+    valid = bin_index>=0
+    if not valid.all():
+        bin_index = bin_index[valid]
+        weights = None if weights is None else weights[valid]
+    if weights is None:
+        weights = torch.ones(1, dtype=sinogram.dtype).expand(bin_index.shape[0])
+    return sinogram.index_add_(0, bin_index, weights.to(sinogram.dtype))
+
+def _accumulate_sparse_sinogram(
+    bin_index: torch.Tensor,
+    bins: torch.Tensor,
+    values: torch.Tensor,
+    weights: torch.Tensor | None = None
+    ) -> Sequence[torch.Tensor]:
+    """Helper function to ``listmode_to_sinogram``: accumulates listmode events into the occupied bins of a sparse sinogram, so that memory scales with the number of non-zero bins rather than the sinogram size
+
+    Args:
+        bin_index (torch.Tensor): Flattened sinogram bin index of each event (events with an index of -1 are ignored)
+        bins (torch.Tensor): Sorted flattened indices of the occupied sinogram bins
+        values (torch.Tensor): Values of the occupied sinogram bins
+        weights (torch.Tensor | None, optional): Binning weights for each listmode event. Defaults to None.
+
+    Returns:
+        Sequence[torch.Tensor]: Updated sorted occupied bins and their values
+    """
+    valid = bin_index>=0
+    if not valid.all():
+        bin_index = bin_index[valid]
+        weights = None if weights is None else weights[valid]
+    if weights is None:
+        weights = torch.ones(1, dtype=values.dtype).expand(bin_index.shape[0])
+    bins, inverse = torch.unique(torch.cat([bins, bin_index]), return_inverse=True)
+    values = torch.zeros(bins.shape[0], dtype=values.dtype).index_add_(0, inverse, torch.cat([values, weights.to(values.dtype)]))
+    return bins, values
+
+def _index_sinogram(sinogram: torch.Tensor, bin_index: torch.Tensor) -> torch.Tensor:
+    """Helper function to ``sinogram_to_listmode``: obtains the values of a dense or sparse (COO) sinogram at the given flattened bin indices without densifying sparse sinograms
+
+    Args:
+        sinogram (torch.Tensor): PET sinogram (dense or sparse)
+        bin_index (torch.Tensor): Flattened sinogram bin indices (indices of -1 yield 0)
+
+    Returns:
+        torch.Tensor: Sinogram values at the given indices
+    """
+    valid = bin_index>=0
+    if not sinogram.is_sparse:
+        return torch.where(valid, sinogram.reshape(-1)[bin_index.clamp(min=0)], 0)
+    sinogram = sinogram.coalesce()
+    strides = torch.tensor(np.cumprod((1,) + sinogram.shape[:0:-1])[::-1].copy())
+    # Coalesced indices are sorted lexicographically, so the flattened indices are sorted
+    bins = (strides[:,None] * sinogram.indices()).sum(dim=0)
+    if bins.numel()==0:
+        return torch.zeros(bin_index.shape, dtype=sinogram.dtype)
+    pos = torch.searchsorted(bins, bin_index).clamp(max=bins.numel()-1)
+    return torch.where((bins[pos]==bin_index)*valid, sinogram.values()[pos], 0)
+
+def get_sinogram_shape(info: dict, tof_meta: PETTOFMeta | None = None) -> tuple:
+    """Obtains the shape of the sinogram corresponding to a PET geometry (including any compression options, see ``get_compressed_info``)
+
+    Args:
+        info (dict): PET geometry information dictionary
+        tof_meta (PETTOFMeta | None, optional): PET TOF metadata. Defaults to None.
+
+    Returns:
+        tuple: Sinogram shape (angular, radial, plane[, TOF])
+    """
+    if info.get('span', 1) == 1 and info.get('max_ring_difference') is None:
+        nr_planes = int(info['NrRings']**2)
+    else:
+        nr_planes = int(sinogram_coordinates(info)[1].max()) + 1
+    sinogram_shape = (int(info['NrCrystalsPerRing']/2) // info.get('angular_mashing', 1), int(info['NrCrystalsPerRing'])+1, nr_planes)
+    if tof_meta is not None:
+        sinogram_shape += (tof_meta.num_bins,)
+    return sinogram_shape
+
+class PackedListmode:
+    """Compact listmode container storing detector IDs as int32, TOF bins as uint8 (or int16 if they do not fit) and optionally event times as float32. Containers are saved in a memory-mappable format (see ``save``), so that loading is lazy and slicing does not copy data. Can be passed wherever listmode detector IDs are accepted (chunks are converted to detector ID tensors on the fly).
+
+    Args:
+        detector_ids (torch.Tensor | np.ndarray): Listmode detector ID data (shape [N,2], or [N,3] with TOF bins as the last column)
+        times (torch.Tensor | np.ndarray | None, optional): Time of each event. Defaults to None.
+        info (dict | None, optional): PET geometry information dictionary, whose hash is stored to check the geometry when loading. Defaults to None.
+    """
+    _magic = b'PYTLM001'
+    _alignment = 64
+
+    def __init__(
+        self,
+        detector_ids: torch.Tensor | np.ndarray,
+        times: torch.Tensor | np.ndarray | None = None,
+        info: dict | None = None
+        ) -> None:
+        detector_ids = np.asarray(detector_ids)
+        self.crystal_ids = np.ascontiguousarray(detector_ids[:,:2], dtype=np.int32)
+        self.tof_bins = None
+        if detector_ids.shape[1] > 2:
+            tof_bins = detector_ids[:,2]
+            fits_uint8 = tof_bins.size==0 or (tof_bins.min() >= 0 and tof_bins.max() <= np.iinfo(np.uint8).max)
+            self.tof_bins = np.ascontiguousarray(tof_bins, dtype=np.uint8 if fits_uint8 else np.int16)
+        self.times = None if times is None else np.ascontiguousarray(times, dtype=np.float32)
+        self.geometry_hash = None if info is None else get_geometry_hash(info)
+
+    @classmethod
+    def _from_arrays(cls, crystal_ids: np.ndarray, tof_bins: np.ndarray | None, times: np.ndarray | None, geometry_hash: str | None) -> PackedListmode:
+        """Creates a container from existing arrays without copying them"""
+        listmode = cls.__new__(cls)
+        listmode.crystal_ids, listmode.tof_bins, listmode.times, listmode.geometry_hash = crystal_ids, tof_bins, times, geometry_hash
+        return listmode
+
+    def __len__(self) -> int:
+        return self.crystal_ids.shape[0]
+
+    @property
+    def shape(self) -> tuple:
+        """Shape of the corresponding detector ID tensor"""
+        return (len(self), 2 if self.tof_bins is None else 3)
+
+    def __getitem__(self, idx: slice) -> PackedListmode:
+        """Obtains a range of events. Slices with a step of 1 are views of the underlying (possibly memory-mapped) arrays."""
+        return self._from_arrays(
+            self.crystal_ids[idx],
+            None if self.tof_bins is None else self.tof_bins[idx],
+            None if self.times is None else self.times[idx],
+            self.geometry_hash
+        )
+
+    def to_detector_ids(self) -> torch.Tensor:
+        """Obtains the detector IDs (with TOF bins as the last column, if present) as an int32 tensor
+
+        Returns:
+            torch.Tensor: Listmode detector ID data
+        """
+        crystal_ids = torch.from_numpy(np.asarray(self.crystal_ids))
+        if self.tof_bins is None:
+            return crystal_ids
+        return torch.cat([crystal_ids, torch.from_numpy(self.tof_bins.astype(np.int32))[:,None]], dim=1)
+
+    def get_times(self) -> torch.Tensor | None:
+        """Obtains the event times (if stored)
+
+        Returns:
+            torch.Tensor | None: Time of each event
+        """
+        return None if self.times is None else torch.from_numpy(np.asarray(self.times))
+
+    def save(self, path: str) -> None:
+        """Saves the container as a small JSON header (fields, dtypes, offsets and geometry hash) followed by the raw arrays, each aligned to 64 bytes
+
+        Args:
+            path (str): Path of saved file
+        """
+        arrays = {name: array for name, array in [('crystal_ids', self.crystal_ids), ('tof_bins', self.tof_bins), ('times', self.times)] if array is not None}
+        fields, offset = {}, 0
+        for name, array in arrays.items():
+            fields[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+            offset += -(-array.nbytes // self._alignment) * self._alignment
+        header = json.dumps({'num_events': len(self), 'geometry_hash': self.geometry_hash, 'fields': fields}).encode()
+        header_size = -(-(len(self._magic) + 8 + len(header)) // self._alignment) * self._alignment
+        with open(path, 'wb') as f:
+            f.write(self._magic + struct.pack('<Q', header_size) + header)
+            for name, array in arrays.items():
+                f.seek(header_size + fields[name]['offset'])
+                f.write(np.ascontiguousarray(array).tobytes())
+            f.truncate(header_size + offset)
+
+    @classmethod
+    def load(cls, path: str, info: dict | None = None) -> PackedListmode:
+        """Loads a container saved with ``save``. Arrays are memory-mapped (copy-on-write), so only the events that are accessed are read from disk.
+
+        Args:
+            path (str): Path of saved file
+            info (dict | None, optional): PET geometry information dictionary. If provided, it must match the geometry hash stored in the file. Defaults to None.
+
+        Returns:
+            PackedListmode: Listmode container
+        """
+        with open(path, 'rb') as f:
+            if f.read(len(cls._magic)) != cls._magic:
+                raise ValueError(f'{path} is not a packed listmode file')
+            header_size = struct.unpack('<Q', f.read(8))[0]
+            header = json.loads(f.read(header_size - len(cls._magic) - 8).rstrip(b'\x00'))
+        if info is not None and header['geometry_hash'] is not None and header['geometry_hash'] != get_geometry_hash(info):
+            raise ValueError(f'Listmode data in {path} was saved for a different scanner geometry')
+        arrays = {}
+        for name, field in header['fields'].items():
+            if field['shape'][0] == 0:
+                arrays[name] = np.zeros(field['shape'], dtype=np.dtype(field['dtype']))
+            else:
+                arrays[name] = np.memmap(path, dtype=np.dtype(field['dtype']), mode='c', offset=header_size + field['offset'], shape=tuple(field['shape']))
+        return cls._from_arrays(arrays['crystal_ids'], arrays.get('tof_bins'), arrays.get('times'), header['geometry_hash'])
+
+def _iterate_listmode_chunks(
+    data: torch.Tensor | np.ndarray | Iterable | None,
+    chunk_size: int
+    ) -> Iterator:
+    """Helper function to ``listmode_to_sinogram_streaming``: yields chunks of listmode data. Array-like data (such as tensors or memory-mapped arrays) is sliced into chunks of ``chunk_size`` events, while any other iterable is assumed to already yield chunks.
+
+    Args:
+        data (torch.Tensor | np.ndarray | Iterable | None): Listmode data (or None, in which case None is yielded indefinitely)
+        chunk_size (int): Number of events in each chunk for array-like data
+
+    Yields:
+        torch.Tensor | None: Chunk of listmode data
+    """
+    if data is None:
+        while True:
+            yield None
+    elif isinstance(data, PackedListmode):
+        for start in range(0, len(data), chunk_size):
+            yield data[start:start+chunk_size].to_detector_ids()
+    elif hasattr(data, 'shape'):
+        for start in range(0, data.shape[0], chunk_size):
+            yield torch.as_tensor(np.asarray(data[start:start+chunk_size])) if not isinstance(data, torch.Tensor) else data[start:start+chunk_size]
+    else:
+        for chunk in data:
+            yield torch.as_tensor(np.asarray(chunk)) if not isinstance(chunk, torch.Tensor) else chunk
+
+def _iterate_weighted_listmode_chunks(
+    data: torch.Tensor | np.ndarray | Iterable,
+    weights: torch.Tensor | np.ndarray | Iterable | None,
+    chunk_size: int
+    ) -> Iterator:
+    """Helper function to ``listmode_to_sinogram_streaming``: yields chunks of listmode data (see ``_iterate_listmode_chunks``) together with the weights of their events. Array-like weights are sliced at the event offset of each chunk, so they remain aligned with data given as chunks of any size. Weights given as an iterable of chunks must have the same chunk sizes as the data.
+
+    Args:
+        data (torch.Tensor | np.ndarray | Iterable): Listmode data
+        weights (torch.Tensor | np.ndarray | Iterable | None): Weights of each event (or None, in which case None is yielded for each chunk)
+        chunk_size (int): Number of events in each chunk for array-like data
+
+    Yields:
+        Sequence[torch.Tensor | None]: Chunk of listmode data and the corresponding weights
+    """
+    if weights is None:
+        for chunk in _iterate_listmode_chunks(data, chunk_size):
+            yield chunk, None
+        return
+    if hasattr(weights, 'shape'):
+        start = 0
+        for chunk in _iterate_listmode_chunks(data, chunk_size):
+            stop = start + chunk.shape[0]
+            if stop > weights.shape[0]:
+                raise ValueError(f'weights has {weights.shape[0]} events, fewer than the listmode data')
+            weights_chunk = weights[start:stop]
+            yield chunk, weights_chunk if isinstance(weights_chunk, torch.Tensor) else torch.as_tensor(np.asarray(weights_chunk))
+            start = stop
+        if start != weights.shape[0]:
+            raise ValueError(f'weights has {weights.shape[0]} events but the listmode data has {start}')
+        return
+    weights_chunks = iter(_iterate_listmode_chunks(weights, chunk_size))
+    for chunk in _iterate_listmode_chunks(data, chunk_size):
+        weights_chunk = next(weights_chunks, None)
+        if weights_chunk is None or weights_chunk.shape[0] != chunk.shape[0]:
+            raise ValueError(f'Chunks of weights must have the same sizes as the chunks of listmode data, got {None if weights_chunk is None else weights_chunk.shape[0]} weights for {chunk.shape[0]} events')
+        yield chunk, weights_chunk
+    if next(weights_chunks, None) is not None:
+        raise ValueError('weights has more chunks than the listmode data')
+
+def listmode_to_sinogram_streaming(
+    detector_ids: torch.Tensor | np.ndarray | PackedListmode | Iterable | ListmodeBinIndex,
+    info: dict,
+    weights: torch.Tensor | np.ndarray | Iterable | None = None,
+    normalization: bool = False,
+    tof_meta: PETTOFMeta = None,
+    chunk_size: int = 10000000,
+    verbose: bool = True,
+    sparse: bool = False
+    ) -> torch.Tensor:
+    """Converts PET listmode data to sinogram without requiring the listmode data to be held in memory. The extra memory used (beyond the sinogram itself) only depends on the chunk size.
+
+    Args:
+        detector_ids (torch.Tensor | np.ndarray | PackedListmode | Iterable | ListmodeBinIndex): Listmode detector ID data (or a precomputed ``ListmodeBinIndex``). Either an array-like object (e.g. a ``PackedListmode``, a memory-mapped array from ``np.load(path, mmap_mode='r')`` or a tensor from ``torch.load(path, mmap=True)``), which is read in chunks of ``chunk_size`` events, or an iterable yielding chunks of detector IDs.
+        info (dict): PET geometry information dictionary
+        weights (torch.Tensor | np.ndarray | Iterable | None, optional): Binning weights for each listmode event, either array-like (sliced to match each chunk of ``detector_ids``) or an iterable yielding chunks of the same sizes as the chunks of ``detector_ids``. Defaults to None.
+        normalization (bool, optional): Whether or not this is a normalization sinogram (need to do some extra steps). Only used for non-TOF sinograms. Defaults to False.
         tof_meta (PETTOFMeta, optional): PET TOF metadata. Defaults to None.
+        chunk_size (int, optional): Number of events read at a time for array-like data. Defaults to 10000000.
+        verbose (bool, optional): Whether or not to print the progress and throughput after each chunk. Defaults to True.
+        sparse (bool, optional): Whether or not to return a sparse (COO) sinogram. Only the occupied bins are then stored, which is much smaller than the dense sinogram for low-count data. Defaults to False.
 
     Returns:
-        torch.Tensor: PET TOF sinogram
+        torch.Tensor: PET sinogram
     """
-    lor_coordinates, sinogram_index = sinogram_coordinates(info)
-    # Sort by decreasing detector ids
-    # Only consider events within TOF range
-    TOF_bins = detector_ids[:,2].clone()
-    detector_ids = detector_ids[:,:2].clone() #.sort(axis=1, descending=True).values
-    within_ring_id = (detector_ids % info['NrCrystalsPerRing']).to(torch.long)
-    ring_ids = (detector_ids // info['NrCrystalsPerRing']).to(torch.long)
-    # Sort by greatest value within ring (required for using various lookup tables)
-    within_ring_id, idx = within_ring_id.sort(axis=1, descending=True)
-    # Opposite detector order
-    TOF_bins[idx[:,0]==1] = tof_meta.num_bins - 1 - TOF_bins[idx[:,0]==1]
-    ring_ids = ring_ids.gather(index=idx, dim=1)
-    # Bin sinogram
-    bin_edges = [
-        torch.arange(int(info['NrCrystalsPerRing']/2)+1).to(torch.float32)-0.5,
-        torch.arange(int(info['NrCrystalsPerRing'])+2).to(torch.float32)-0.5,
-        torch.arange(int(info['NrRings']**2)+1).to(torch.float32)-0.5 # CHANGED, ADDED THE MISSING NR RINGS
-    ]
-    data = torch.concatenate([lor_coordinates[within_ring_id[:,0], within_ring_id[:,1]], sinogram_index[ring_ids[:,0], ring_ids[:,1]].unsqueeze(1)], dim=-1).to(torch.float32)
-    # Need the loop to prevent memory errors in histogramdd for large dimensionality
-    sinogram = torch.empty((len(bin_edges[0])-1, len(bin_edges[1])-1, len(bin_edges[2])-1, tof_meta.num_bins), dtype=torch.float32)
-    for bin in range(tof_meta.num_bins):
-        if weights is None:
-            weights_TOF_bin = None
+    sinogram_shape = get_sinogram_shape(info, tof_meta)
+    if sparse:
+        bins, values = torch.zeros(0, dtype=torch.long), torch.zeros(0, dtype=torch.float32)
+    else:
+        sinogram = torch.zeros(int(np.prod(sinogram_shape)), dtype=torch.float32)
+    precomputed = isinstance(detector_ids, ListmodeBinIndex)
+    if precomputed:
+        if normalization and tof_meta is None:
+            raise ValueError('Normalization sinograms require detector IDs rather than a ListmodeBinIndex')
+        num_total = len(detector_ids)
+        chunks = (detector_ids.get_sinogram_bin_index(tof_meta is not None, start, start+chunk_size) for start in range(0, num_total, chunk_size))
+    else:
+        num_total = detector_ids.shape[0] if hasattr(detector_ids, 'shape') else None
+        chunks = _iterate_listmode_chunks(detector_ids, chunk_size)
+    num_processed = 0
+    time_start = time.time()
+    for chunk, weights_chunk in _iterate_weighted_listmode_chunks(chunks, weights, chunk_size):
+        bin_index = chunk if precomputed else _get_sinogram_bin_index(chunk, info, tof_meta)
+        # Opposite binning for normalization sinogram, which always considers "ring_id"s in order (this only works because of +/- z symmetry of normalization factors)
+        if normalization and tof_meta is None:
+            bin_index = torch.cat([bin_index, _get_sinogram_bin_index(chunk, info, reverse=True)])
+            weights_chunk = None if weights_chunk is None else weights_chunk.repeat(2)
+        if sparse:
+            bins, values = _accumulate_sparse_sinogram(bin_index, bins, values, weights_chunk)
         else:
-            weights_TOF_bin = weights[TOF_bins==bin]
-        sinogram_TOF_bin = torch.histogramdd(
-            data[TOF_bins==bin],
-            bin_edges,
-            weight=weights_TOF_bin
-        )[0]
-        sinogram[...,bin] = sinogram_TOF_bin
-    return sinogram
+            _accumulate_sinogram(bin_index, sinogram, weights_chunk) # CHANGED
+        num_processed += chunk.shape[0]
+        if verbose:
+            time_elapsed = time.time() - time_start
+            progress = f'{num_processed}/{num_total} events' if num_total is not None else f'{num_processed} events'
+            print(f"[Binning] {progress} ({num_processed / max(time_elapsed, 1e-9):.3e} events/s)")
+    if sparse:
+        if normalization and tof_meta is None:
+            values /= 2
+        indices = torch.stack(torch.unravel_index(bins, sinogram_shape))
+        return torch.sparse_coo_tensor(indices, values, sinogram_shape, check_invariants=False, is_coalesced=True)
+    if normalization and tof_meta is None:
+        sinogram /= 2
+    return sinogram.reshape(sinogram_shape)
+
+def listmode_to_sinogram(
+    detector_ids: torch.Tensor | PackedListmode | ListmodeBinIndex,
+    info: dict,
+    weights: torch.Tensor = None,
+    normalization: bool = False,
+    tof_meta: PETTOFMeta = None,
+    chunk_size: int = 10000000,
+    sparse: bool = False
+    ) -> torch.Tensor:
+    """Converts PET listmode data to sinogram. Events are processed in chunks, each accumulated directly into its (angular, radial, plane[, TOF]) bin of the sinogram.
+
+    Args:
+        detector_ids (torch.Tensor | PackedListmode | ListmodeBinIndex): Listmode detector ID data (or a precomputed ``ListmodeBinIndex``)
+        info (dict): PET geometry information dictionary
+        weights (torch.Tensor, optional): Binning weights for each listmode event. Defaults to None.
+        normalization (bool, optional): Whether or not this is a normalization sinogram (need to do some extra steps). Only used for non-TOF sinograms. Defaults to False.
+        tof_meta (PETTOFMeta, optional): PET TOF metadata. Defaults to None.
+        chunk_size (int, optional): Number of events processed at a time (bounds the memory of intermediate per-event tensors). Defaults to 10000000.
+        sparse (bool, optional): Whether or not to return a sparse (COO) sinogram storing only the occupied bins. Defaults to False.
+
+    Returns:
+        torch.Tensor: PET sinogram
+    """
+    return listmode_to_sinogram_streaming(detector_ids, info, weights, normalization, tof_meta, chunk_size, verbose=False, sparse=sparse)
 
 def get_detector_ids_from_trans_axial_ids(
     ids_trans_crystal: torch.Tensor,
@@ -316,7 +934,97 @@ def get_axial_trans_ids_from_info(
     return_combinations: bool = False,
     sort_by_detector_ids: bool = False
 ):
-    """Get axial and transaxial IDs dynamically from info dictionary"""
+    """Get axial and transaxial IDs dynamically from info dictionary. For large scanners, use ``iterate_axial_trans_ids_combinations`` to obtain the combinations in blocks."""
+    ids = _get_axial_trans_ids_from_info(info, sort_by_detector_ids)
+    if return_combinations:
+        ids = tuple(torch.combinations(ids_part, 2) for ids_part in ids)
+    return ids
+
+def _get_pair_combinations(num_elements: int, start: int, stop: int) -> torch.Tensor:
+    """Helper function to ``iterate_detector_pair_combinations``: obtains the pairs :math:`(i,j)`, :math:`i<j`, with combination indices in ``[start, stop)``, ordered as in ``torch.combinations``. Row :math:`i` starts at combination index :math:`k_i = i(2n-i-1)/2`, which is inverted in closed form.
+
+    Args:
+        num_elements (int): Number of elements :math:`n`
+        start (int): First combination index
+        stop (int): Last combination index (exclusive)
+
+    Returns:
+        torch.Tensor: Pairs of shape [stop-start, 2]
+    """
+    k = torch.arange(start, stop, dtype=torch.int64)
+    row_start = lambda i: i * (2 * num_elements - i - 1) // 2
+    i = torch.floor(((2 * num_elements - 1) - torch.sqrt((2 * num_elements - 1)**2 - 8 * k.to(torch.float64))) / 2).to(torch.int64)
+    # Correct for floating point rounding
+    i = torch.where(row_start(i + 1) <= k, i + 1, i)
+    i = torch.where(row_start(i) > k, i - 1, i)
+    j = k - row_start(i) + i + 1
+    return torch.stack([i, j], dim=1)
+
+def iterate_detector_pair_combinations(num_detectors: int, chunk_size: int = 10000000) -> Iterator[torch.Tensor]:
+    """Yields all pairs of detector IDs in blocks of ``chunk_size`` pairs, in the same order as ``torch.combinations(torch.arange(num_detectors), 2)``, without holding all pairs in memory
+
+    Args:
+        num_detectors (int): Total number of detectors
+        chunk_size (int, optional): Number of pairs in each block. Defaults to 10000000.
+
+    Yields:
+        torch.Tensor: Detector ID pairs of shape [chunk_size, 2] (the last block may be smaller)
+    """
+    num_pairs = num_detectors * (num_detectors - 1) // 2
+    for start in range(0, num_pairs, chunk_size):
+        yield _get_pair_combinations(num_detectors, start, min(start + chunk_size, num_pairs))
+
+def iterate_axial_trans_ids_combinations(
+    info: dict,
+    chunk_size: int = 10000000,
+    sort_by_detector_ids: bool = False
+) -> Iterator[tuple]:
+    """Yields the axial and transaxial IDs of all detector pairs in blocks of ``chunk_size`` pairs. Concatenating the blocks gives the same result as ``get_axial_trans_ids_from_info(info, return_combinations=True, sort_by_detector_ids=sort_by_detector_ids)``, without holding all pairs in memory.
+
+    Args:
+        info (dict): PET geometry information dictionary
+        chunk_size (int, optional): Number of pairs in each block. Defaults to 10000000.
+        sort_by_detector_ids (bool, optional): Whether or not detectors are ordered by detector ID (in which case the pairs of each block are ``iterate_detector_pair_combinations`` blocks). Defaults to False.
+
+    Yields:
+        tuple: IDs of each level of the hierarchy (same order as ``get_axial_trans_ids_from_info``), each of shape [chunk_size, 2]
+    """
+    ids = _get_axial_trans_ids_from_info(info, sort_by_detector_ids)
+    for pairs in iterate_detector_pair_combinations(ids[0].shape[0], chunk_size):
+        yield tuple(ids_part[pairs] for ids_part in ids)
+
+def _get_hierarchy_ids(ids: torch.Tensor, level_sizes: Sequence[int]) -> list[torch.Tensor]:
+    """Helper function to ``get_scanner_LUT`` and ``get_axial_trans_ids_from_info``: decomposes ring (or within-ring) indices into the IDs of each level of the hierarchy (inverse of ``get_detector_ids_from_trans_axial_ids``)
+
+    Args:
+        ids (torch.Tensor): Ring (or within-ring) indices
+        level_sizes (Sequence[int]): Number of elements of each level of the hierarchy (crystal, submodule, module, rsector)
+
+    Returns:
+        list[torch.Tensor]: IDs of each level of the hierarchy (crystal, submodule, module, rsector)
+    """
+    ids_levels = []
+    for level_size in level_sizes:
+        ids_levels.append(ids % level_size)
+        ids = ids // level_size
+    return ids_levels
+
+@_cache_geometry_tables(num_tables=8)
+def _get_axial_trans_ids_from_info(
+    info: dict,
+    sort_by_detector_ids: bool = False
+):
+    """Helper function to ``get_axial_trans_ids_from_info`` that computes the (cached) IDs of each level of the hierarchy for every detector"""
+    if sort_by_detector_ids:
+        # Detector IDs are ring * nr_crystals_per_ring + within-ring index: decompose them directly rather than sorting all combinations
+        nr_rings = int(info['crystalAxialNr'] * info['submoduleAxialNr'] * info['moduleAxialNr'] * info['rsectorAxialNr'])
+        nr_crystals_per_ring = int(info['crystalTransNr'] * info['submoduleTransNr'] * info['moduleTransNr'] * info['rsectorTransNr'])
+        ids_axial = _get_hierarchy_ids(torch.arange(nr_rings).repeat_interleave(nr_crystals_per_ring), [info['crystalAxialNr'], info['submoduleAxialNr'], info['moduleAxialNr'], info['rsectorAxialNr']])
+        ids_trans = _get_hierarchy_ids(torch.arange(nr_crystals_per_ring).repeat(nr_rings), [info['crystalTransNr'], info['submoduleTransNr'], info['moduleTransNr'], info['rsectorTransNr']])
+        ids_trans_crystal, ids_trans_submodule, ids_trans_module, ids_trans_rsector = ids_trans
+        ids_axial_crystal, ids_axial_submodule, ids_axial_module, ids_axial_rsector = ids_axial
+        return ids_trans_crystal, ids_axial_crystal, ids_trans_submodule, ids_axial_submodule, ids_trans_module, ids_axial_module, ids_trans_rsector, ids_axial_rsector
+
     # Generate IDs for each level of hierarchy
     ids_trans_crystal = torch.arange(0, info['crystalTransNr'])
     ids_axial_crystal = torch.arange(0, info['crystalAxialNr'])
@@ -333,37 +1041,15 @@ def get_axial_trans_ids_from_info(
         ids_trans_module, ids_axial_module, ids_trans_rsector, ids_axial_rsector
     ).T
     
-    if sort_by_detector_ids:
-        ids_detector = get_detector_ids_from_trans_axial_ids(
-            ids_trans_crystal, ids_trans_submodule, ids_trans_module, ids_trans_rsector,
-            ids_axial_crystal, ids_axial_submodule, ids_axial_module, ids_axial_rsector, 
-            info
-        )
-        idx_sort = torch.argsort(ids_detector)
-        ids_trans_crystal = ids_trans_crystal[idx_sort]
-        ids_axial_crystal = ids_axial_crystal[idx_sort]
-        ids_trans_submodule = ids_trans_submodule[idx_sort]
-        ids_axial_submodule = ids_axial_submodule[idx_sort]
-        ids_trans_module = ids_trans_module[idx_sort]
-        ids_axial_module = ids_axial_module[idx_sort]
-        ids_trans_rsector = ids_trans_rsector[idx_sort]
-        ids_axial_rsector = ids_axial_rsector[idx_sort]
-    
-    if return_combinations:
-        ids_trans_crystal = torch.combinations(ids_trans_crystal, 2)
-        ids_axial_crystal = torch.combinations(ids_axial_crystal, 2)
-        ids_trans_submodule = torch.combinations(ids_trans_submodule, 2)
-        ids_axial_submodule = torch.combinations(ids_axial_submodule, 2)
-        ids_trans_module = torch.combinations(ids_trans_module, 2)
-        ids_axial_module = torch.combinations(ids_axial_module, 2)
-        ids_trans_rsector = torch.combinations(ids_trans_rsector, 2)
-        ids_axial_rsector = torch.combinations(ids_axial_rsector, 2)
-    
     return ids_trans_crystal, ids_axial_crystal, ids_trans_submodule, ids_axial_submodule, ids_trans_module, ids_axial_module, ids_trans_rsector, ids_axial_rsector
 
+@_cache_geometry_tables(num_tables=1)
 def get_scanner_LUT(info: dict):
-    """Obtains scanner lookup table that dynamically accounts for submodules"""
-    ids_trans_crystal, ids_axial_crystal, ids_trans_submodule, ids_axial_submodule, ids_trans_module, ids_axial_module, ids_trans_rsector, ids_axial_rsector = get_axial_trans_ids_from_info(info, sort_by_detector_ids=True)
+    """Obtains scanner lookup table that dynamically accounts for submodules. Axial positions are computed once per ring and transaxial positions once per within-ring crystal, then broadcast to all detectors in detector ID order."""
+    nr_rings = int(info['crystalAxialNr'] * info['submoduleAxialNr'] * info['moduleAxialNr'] * info['rsectorAxialNr'])
+    nr_crystals_per_ring = int(info['crystalTransNr'] * info['submoduleTransNr'] * info['moduleTransNr'] * info['rsectorTransNr'])
+    ids_axial_crystal, ids_axial_submodule, ids_axial_module, ids_axial_rsector = _get_hierarchy_ids(torch.arange(nr_rings), [info['crystalAxialNr'], info['submoduleAxialNr'], info['moduleAxialNr'], info['rsectorAxialNr']])
+    ids_trans_crystal, ids_trans_submodule, ids_trans_module, ids_trans_rsector = _get_hierarchy_ids(torch.arange(nr_crystals_per_ring), [info['crystalTransNr'], info['submoduleTransNr'], info['moduleTransNr'], info['rsectorTransNr']])
     
     # Use values from info dictionary
     radius = info.get('radius', 391.5)
@@ -408,40 +1094,104 @@ def get_scanner_LUT(info: dict):
     global_x = local_x * torch.cos(rsector_angle) - local_y * torch.sin(rsector_angle)
     global_y = local_x * torch.sin(rsector_angle) + local_y * torch.cos(rsector_angle)
     
-    # Stack coordinates (Z is typically negative in PET coordinate systems)
-    XYZ_crystals = torch.vstack([global_x, global_y, -Z_total]).T
+    # Stack coordinates (Z is typically negative in PET coordinate systems); detector ID = ring * nr_crystals_per_ring + within-ring index
+    XYZ_crystals = torch.vstack([global_x.repeat(nr_rings), global_y.repeat(nr_rings), (-Z_total).repeat_interleave(nr_crystals_per_ring)]).T
     
     return XYZ_crystals
 
-def sinogram_to_listmode(detector_ids: torch.Tensor, sinogram: torch.Tensor, info: dict) -> torch.Tensor:
-    """Obtains listmode data from a sinogram at the given detector IDs
+def sinogram_to_listmode(detector_ids: torch.Tensor | PackedListmode | ListmodeBinIndex, sinogram: torch.Tensor, info: dict) -> torch.Tensor:
+    """Obtains listmode data from a sinogram at the given detector IDs. Each event takes the value of the sinogram bin it would be binned into by ``listmode_to_sinogram``; events outside of the sinogram yield 0.
 
     Args:
-        detector_ids (torch.Tensor): Detector IDs at which to obtain listmode data
-        sinogram (torch.Tensor): PET sinogram
-        info (dict): PET geometry information dictionary
+        detector_ids (torch.Tensor | PackedListmode | ListmodeBinIndex): Detector IDs at which to obtain listmode data (or a precomputed ``ListmodeBinIndex``)
+        sinogram (torch.Tensor): PET sinogram (dense or sparse)
+        info (dict): PET geometry information dictionary. For compressed sinograms (see ``get_compressed_info``), values are divided by the number of angular bins and ring pairs combined into each sinogram bin, and events beyond the maximum ring difference yield 0.
 
     Returns:
         torch.Tensor: Listmode data
     """     
     # TODO: multiple IDs map to same sinogram bin -> need to divide by number of LORs mapping to each sinogram bin
-    lor_coordinates, sinogram_index = sinogram_coordinates(info)
-    detector_ids_spatial = detector_ids[:,:2].clone()
-    within_ring_id = (detector_ids_spatial % info['NrCrystalsPerRing']).to(torch.long)
-    ring_ids = (detector_ids_spatial // info['NrCrystalsPerRing']).to(torch.long)
-    within_ring_id, idx = within_ring_id.sort(axis=1, descending=True)
-    ring_ids = ring_ids.gather(index=idx, dim=1)
-    ring_ids = ring_ids.gather(index=idx, dim=1)
-    lm_return = 0
-    idx0, idx1 = lor_coordinates[within_ring_id[:,0], within_ring_id[:,1]].T
-    idx2 = sinogram_index[ring_ids[:,0], ring_ids[:,1]]
-    if len(sinogram.shape)>3: # If TOF
-        idxTOF =  detector_ids[:,2].clone()
-        lm_return += sinogram[idx0, idx1, idx2, idxTOF] # randoms same for all TOF bins
+    TOF = len(sinogram.shape)>3 # If TOF
+    if isinstance(detector_ids, PackedListmode):
+        detector_ids = detector_ids.to_detector_ids()
+    if isinstance(detector_ids, ListmodeBinIndex):
+        bin_index = detector_ids.get_sinogram_bin_index(TOF)
     else:
-        lm_return += sinogram[idx0, idx1, idx2]
+        num_tof_bins = sinogram.shape[3] if TOF else None
+        bin_index = _combine_bin_components(*_get_listmode_bin_components(detector_ids, info, num_tof_bins), num_tof_bins)
+    lm_return = _index_sinogram(sinogram, bin_index)
+    # Compressed sinograms: divide by the number of (angular bin, ring pair) combinations in each bin
+    if info.get('span', 1) != 1 or info.get('max_ring_difference') is not None or info.get('angular_mashing', 1) != 1:
+        _, sinogram_index = sinogram_coordinates(info)
+        nr_planes = get_sinogram_shape(info)[2]
+        nr_ring_pairs = torch.bincount(sinogram_index[sinogram_index>=0], minlength=nr_planes)
+        idx_plane = (bin_index // sinogram.shape[3] if TOF else bin_index) % nr_planes
+        lm_return = lm_return / (info.get('angular_mashing', 1) * nr_ring_pairs[idx_plane].clamp(min=1))
     return lm_return
 
+def _gaussian_filter_1d_(
+    x: torch.Tensor,
+    dim: int,
+    sigma: float,
+    kernel_size: int,
+    padding_mode: str = 'replicate',
+    method: str = 'auto',
+    fft_threshold: int = 64,
+    num_blocks: int = 8
+    ) -> torch.Tensor:
+    """Helper function to ``smooth_randoms_sinogram``: applies a 1D Gaussian filter (same weights as ``get_1d_gaussian_kernel``) along one dimension of a tensor in place, without transposing or flattening the tensor. The tensor is filtered in blocks along ``dim``: only the current block (with its neighbouring ``kernel_size // 2`` slices) and the boundary slabs used for padding are copied, rather than the full padded tensor.
+
+    Args:
+        x (torch.Tensor): Tensor to blur (modified in place)
+        dim (int): Dimension along which to blur
+        sigma (float): Sigma (in pixels) of blurring
+        kernel_size (int): Size of kernel used
+        padding_mode (str, optional): Type of padding, either 'replicate' or 'circular'. Defaults to 'replicate'.
+        method (str, optional): Either 'direct' (sum of shifted slices), 'fft' (FFT based convolution) or 'auto' (FFT for kernels larger than ``fft_threshold``). Defaults to 'auto'.
+        fft_threshold (int, optional): Kernel size above which FFT based convolution is used when ``method='auto'``. Defaults to 64.
+        num_blocks (int, optional): Number of blocks along ``dim`` (blocks contain at least ``kernel_size`` slices). Defaults to 8.
+
+    Returns:
+        torch.Tensor: Blurred tensor
+    """
+    kernel = get_1d_gaussian_kernel(sigma, kernel_size).weight.data.ravel().to(x.dtype).to(x.device)
+    length = x.shape[dim]
+    half_width = kernel.shape[0] // 2
+    idx_before = torch.arange(-half_width, 0)
+    idx_after = torch.arange(length, length + half_width)
+    if padding_mode == 'circular':
+        idx_before, idx_after = idx_before % length, idx_after % length
+    elif padding_mode == 'replicate':
+        idx_before, idx_after = idx_before.clamp(0, length - 1), idx_after.clamp(0, length - 1)
+    else:
+        raise ValueError(f'padding_mode must be one of "replicate" or "circular", got "{padding_mode}"')
+    if method == 'auto':
+        method = 'fft' if kernel.shape[0] > fft_threshold else 'direct'
+    if method not in ['direct', 'fft']:
+        raise ValueError(f'method must be one of "auto", "direct" or "fft", got "{method}"')
+    # Padding slabs are taken before any slice is overwritten
+    slab_before = x.index_select(dim, idx_before.to(x.device))
+    slab_after = x.index_select(dim, idx_after.to(x.device))
+    block_size = max(kernel.shape[0], int(np.ceil(length / num_blocks)))
+    for start in range(0, length, block_size):
+        size = min(block_size, length - start)
+        # Original values of the block and of its neighbouring slices (the preceding slices were already overwritten, so they are carried over from the previous block)
+        stop = min(start + size + half_width, length)
+        block = torch.cat([slab_before, x.narrow(dim, start, stop - start), slab_after.narrow(dim, 0, start + size + half_width - stop)], dim=dim)
+        slab_before = block.narrow(dim, size, half_width)
+        x_block = x.narrow(dim, start, size)
+        if method == 'direct':
+            x_block.copy_(block.narrow(dim, 0, size)).mul_(kernel[0])
+            for i in range(1, kernel.shape[0]):
+                x_block.add_(block.narrow(dim, i, size), alpha=kernel[i].item())
+        else:
+            n_fft = block.shape[dim] + kernel.shape[0] - 1
+            shape = [1] * x.dim()
+            shape[dim] = -1
+            kernel_fft = torch.fft.rfft(kernel.flip(0), n=n_fft).reshape(shape)
+            x_block.copy_(torch.fft.irfft(torch.fft.rfft(block, n=n_fft, dim=dim) * kernel_fft, n=n_fft, dim=dim).narrow(dim, kernel.shape[0] - 1, size))
+    return x
+
 @torch.no_grad()
 def smooth_randoms_sinogram(
     sinogram_random: torch.Tensor,
@@ -451,12 +1201,14 @@ def smooth_randoms_sinogram(
     sigma_z: float = 4,
     kernel_size_r: int = 21,
     kernel_size_theta: int = 21,
-    kernel_size_z: int = 21
+    kernel_size_z: int = 21,
+    method: str = 'auto',
+    inplace: bool = False
     ) -> torch.Tensor:
-    """Smooths a PET randoms sinogram using a Gaussian filter in the r, theta, and z direction. Rebins the sinogram into (r,theta,z1,z2) before blurring (same blurring applied to z1 and z2)
+    """Smooths a PET randoms sinogram using a Gaussian filter in the r, theta, and z direction. Rebins the sinogram into (r,theta,z1,z2) before blurring (same blurring applied to z1 and z2). For axially compressed sinograms, each plane is split evenly between its ring pairs, blurred with a normalized convolution over the valid ring pairs (the blurred sinogram is divided by the blurred mask of valid ring pairs) and summed back after blurring.
 
     Args:
-        sinogram_random (torch.Tensor): PET sinogram of randoms
+        sinogram_random (torch.Tensor): PET sinogram of randoms (dense or sparse; sparse sinograms are densified since smoothing fills all bins)
         info (dict): PET geometry information dictionary
         sigma_r (float, optional): Blurring (in pixel size) in r direction. Defaults to 4.
         sigma_theta (float, optional): Blurring (in pixel size) in r direction. Defaults to 4.
@@ -464,24 +1216,310 @@ def smooth_randoms_sinogram(
         kernel_size_r (int, optional): Kernel size in r direction. Defaults to 21.
         kernel_size_theta (int, optional): Kernel size in theta direction. Defaults to 21.
         kernel_size_z (int, optional): Kernel size in z1/z2 diretions. Defaults to 21.
+        method (str, optional): Convolution method used for each direction: 'direct', 'fft' or 'auto' (FFT for large kernels only). Defaults to 'auto'.
+        inplace (bool, optional): Whether or not to write the smoothed sinogram into ``sinogram_random`` (saves the memory of one sinogram; ignored for sparse sinograms). Defaults to False.
 
     Returns:
         torch.Tensor: Smoothed randoms sinogram
     """
+    if sinogram_random.is_sparse:
+        sinogram_random, inplace = sinogram_random.to_dense(), True
     _, sinogram_index = sinogram_coordinates(info)
-    sino = sinogram_random[:,:,sinogram_index]
-    ktheta = get_1d_gaussian_kernel(sigma_theta, kernel_size_theta, 'circular')
-    kr = get_1d_gaussian_kernel(sigma_r, kernel_size_r, 'replicate')
-    kz = get_1d_gaussian_kernel(sigma_z, kernel_size_z, 'replicate')
-    for i, k in enumerate([ktheta,kr,kz,kz]):
-        sino = sino.swapaxes(i,3)
-        sino = k(sino.flatten(end_dim=-2).unsqueeze(1)).reshape(sino.shape)
-        sino = sino.swapaxes(i,3)
-    ii = torch.argsort(sinogram_index.ravel())
-    ix, iy = ii // sino.shape[-2], ii % sino.shape[-1]
-    sinogram_random_interp = sino[:,:,ix,iy]
+    valid = sinogram_index>=0
+    nr_ring_pairs = torch.bincount(sinogram_index[valid], minlength=sinogram_random.shape[2])
+    compressed = not valid.all() or (nr_ring_pairs>1).any()
+    sino = sinogram_random[:,:,sinogram_index.clamp(min=0)].to(torch.float32)
+    if compressed:
+        # Split the counts of each plane evenly between its ring pairs
+        sino *= valid / nr_ring_pairs[sinogram_index.clamp(min=0)].clamp(min=1)
+    # Blur each direction in place on the rebinned (theta,r,z1,z2) sinogram
+    for dim, sigma, kernel_size, padding_mode in [(0, sigma_theta, kernel_size_theta, 'circular'), (1, sigma_r, kernel_size_r, 'replicate'), (2, sigma_z, kernel_size_z, 'replicate'), (3, sigma_z, kernel_size_z, 'replicate')]:
+        _gaussian_filter_1d_(sino, dim, sigma, kernel_size, padding_mode, method)
+    if compressed:
+        # Normalized convolution: ring pairs beyond the maximum ring difference do not contribute to the blurred values of the valid ring pairs
+        valid_blurred = valid.to(torch.float32)
+        for dim in (0, 1):
+            _gaussian_filter_1d_(valid_blurred, dim, sigma_z, kernel_size_z, 'replicate', method)
+        sino *= valid / valid_blurred.clamp(min=1e-6)
+    # Sum the ring pairs of each plane back (a single ring pair for uncompressed sinograms)
+    sinogram_random_interp = sinogram_random.zero_() if inplace else torch.zeros(sinogram_random.shape, dtype=sino.dtype)
+    sinogram_random_interp.index_add_(2, sinogram_index[valid], sino[:,:,valid].to(sinogram_random_interp.dtype))
     return sinogram_random_interp
 
+def get_singles_from_delays(
+    detector_ids_delays: torch.Tensor | np.ndarray | Iterable,
+    info: dict,
+    weights: torch.Tensor | np.ndarray | Iterable | None = None,
+    num_iterations: int = 20,
+    chunk_size: int = 10000000
+    ) -> torch.Tensor:
+    r"""Estimates crystal singles factors :math:`s_i` from delayed coincidences using the fan-sum (Casey) method, such that the expected number of randoms on the LOR between crystals :math:`i` and :math:`j` is :math:`s_i s_j`. The fan sum :math:`F_i` (number of delays involving crystal :math:`i`) is obtained with a single ``bincount`` and :math:`F_i = s_i \sum_{j \in \text{fan}(i)} s_j` is solved by fixed point iteration, where the fan of a crystal contains all crystals it forms a sinogram LOR with.
+
+    Args:
+        detector_ids_delays (torch.Tensor | np.ndarray | Iterable): Listmode detector IDs of delayed coincidences (array-like or iterable of chunks, see ``listmode_to_sinogram_streaming``)
+        info (dict): PET geometry information dictionary
+        weights (torch.Tensor | np.ndarray | Iterable | None, optional): Weights of each delayed event. Defaults to None.
+        num_iterations (int, optional): Number of fixed point iterations. Defaults to 20.
+        chunk_size (int, optional): Number of events read at a time for array-like data. Defaults to 10000000.
+
+    Returns:
+        torch.Tensor: Singles factor of each crystal (shape [N_detectors])
+    """
+    nr_rings, nr_crystals_per_ring = int(info['NrRings']), int(info['NrCrystalsPerRing'])
+    fan_sum = torch.zeros(nr_rings * nr_crystals_per_ring, dtype=torch.float64)
+    for detector_ids_chunk, weights_chunk in _iterate_weighted_listmode_chunks(detector_ids_delays, weights, chunk_size):
+        weights_chunk = None if weights_chunk is None else weights_chunk.to(torch.float64).repeat(2)
+        fan_sum += torch.bincount(detector_ids_chunk[:,:2].T.reshape(-1).to(torch.long), weights=weights_chunk, minlength=fan_sum.shape[0])
+    fan_sum = fan_sum.reshape(nr_rings, nr_crystals_per_ring)
+    # Fan of crystal (ring, w): crystals (ring', w') with a valid ring pair and a valid within-ring pair (excluding itself and pairs closer than the minimum rsector difference, which have a bin index of -1)
+    _, sinogram_index = sinogram_coordinates(info)
+    ring_mask = (sinogram_index>=0).to(torch.float64)
+    lor_mask = (get_lor_bin_index(info)>=0).to(torch.float64)
+    self_mask = ring_mask.diagonal()[:,None] * lor_mask.diagonal()[None,:]
+    singles = fan_sum / fan_sum.sum().sqrt().clamp(min=1e-12)
+    for _ in range(num_iterations):
+        fan_singles = ring_mask @ singles @ lor_mask.T - self_mask * singles
+        # Geometric mean damping of the update s <- F / sum_fan(s)
+        singles = torch.sqrt(singles * fan_sum / fan_singles.clamp(min=1e-12))
+    return singles.ravel().to(torch.float32)
+
+def randoms_fansum_to_listmode(singles: torch.Tensor, detector_ids: torch.Tensor | PackedListmode) -> torch.Tensor:
+    """Obtains the expected randoms of listmode events from crystal singles factors (see ``get_singles_from_delays``)
+
+    Args:
+        singles (torch.Tensor): Singles factor of each crystal
+        detector_ids (torch.Tensor | PackedListmode): Detector IDs at which to obtain randoms
+
+    Returns:
+        torch.Tensor: Expected randoms of each event
+    """
+    if isinstance(detector_ids, PackedListmode):
+        detector_ids = detector_ids.to_detector_ids()
+    detector_ids = detector_ids[:,:2].to(torch.long)
+    return singles[detector_ids[:,0]] * singles[detector_ids[:,1]]
+
+def randoms_fansum_to_sinogram(singles: torch.Tensor, info: dict, chunk_size: int = 10000000) -> torch.Tensor:
+    """Obtains a (non-TOF) randoms sinogram from crystal singles factors (see ``get_singles_from_delays``) by binning the expected randoms :math:`s_i s_j` of all crystal pairs. The sinogram can be converted to TOF using ``randoms_sinogram_to_sinogramTOF``.
+
+    Args:
+        singles (torch.Tensor): Singles factor of each crystal
+        info (dict): PET geometry information dictionary
+        chunk_size (int, optional): Number of crystal pairs binned at a time. Defaults to 10000000.
+
+    Returns:
+        torch.Tensor: Randoms sinogram
+    """
+    sinogram_shape = get_sinogram_shape(info)
+    sinogram = torch.zeros(int(np.prod(sinogram_shape)), dtype=torch.float32)
+    for pairs in iterate_detector_pair_combinations(singles.shape[0], chunk_size):
+        _accumulate_sinogram(_get_sinogram_bin_index(pairs, info), sinogram, randoms_fansum_to_listmode(singles, pairs))
+    return sinogram.reshape(sinogram_shape)
+
+def _get_symmetry_class_shape(info: dict) -> tuple:
+    """Helper function to ``ComponentNormalization``: obtains the shape of the detector pair symmetry histogram (axial crystal ID of both detectors, transaxial crystal ID of both detectors, axial submodule difference, axial module difference, transaxial rsector difference), matching ``gate.get_symmetry_histogram_all_combos``
+
+    Args:
+        info (dict): PET geometry information dictionary
+
+    Returns:
+        tuple: Shape of the symmetry histogram
+    """
+    return (info['crystalAxialNr'], info['crystalAxialNr'], info['crystalTransNr'], info['crystalTransNr'], 2 * info['submoduleAxialNr'] - 1, 2 * info['moduleAxialNr'] - 1, info['rsectorTransNr'])
+
+def _get_symmetry_class_index(detector_ids: torch.Tensor, info: dict) -> torch.Tensor:
+    """Helper function to ``ComponentNormalization``: obtains the flattened symmetry histogram bin (see ``_get_symmetry_class_shape``) of each detector pair, with the smallest detector ID considered first
+
+    Args:
+        detector_ids (torch.Tensor): Detector ID pairs
+        info (dict): PET geometry information dictionary
+
+    Returns:
+        torch.Tensor: Flattened symmetry histogram bin of each pair
+    """
+    ids_trans_crystal, ids_axial_crystal, _, ids_axial_submodule, _, ids_axial_module, ids_trans_rsector, _ = _get_axial_trans_ids_from_info(info, True)
+    detector_ids = detector_ids[:,:2].to(torch.long)
+    ids_min, ids_max = detector_ids.min(dim=1).values, detector_ids.max(dim=1).values
+    class_ids = [
+        ids_axial_crystal[ids_min],
+        ids_axial_crystal[ids_max],
+        ids_trans_crystal[ids_min],
+        ids_trans_crystal[ids_max],
+        ids_axial_submodule[ids_max] - ids_axial_submodule[ids_min] + (info['submoduleAxialNr'] - 1),
+        ids_axial_module[ids_max] - ids_axial_module[ids_min] + (info['moduleAxialNr'] - 1),
+        (ids_trans_rsector[ids_max] - ids_trans_rsector[ids_min]) % info['rsectorTransNr']
+    ]
+    class_index = 0
+    for class_id, size in zip(class_ids, _get_symmetry_class_shape(info)):
+        class_index = class_index * size + class_id
+    return class_index
+
+def _get_cylinder_geometric_factor(detector_ids: torch.Tensor, scanner_LUT: torch.Tensor, cylinder_radius: float) -> torch.Tensor:
+    """Helper function to ``ComponentNormalization``: obtains the geometric correction factor for the non-uniform exposure of LORs by a cylindrical calibration phantom (inverse of the relative chord length), matching ``gate.get_normalization_weights_cylinder_calibration``. LORs that do not intersect the phantom yield NaN.
+
+    Args:
+        detector_ids (torch.Tensor): Detector ID pairs
+        scanner_LUT (torch.Tensor): Scanner lookup table
+        cylinder_radius (float): Radius of cylindrical phantom used in scan
+
+    Returns:
+        torch.Tensor: Geometric correction factor of each pair
+    """
+    x1, y1, _ = scanner_LUT[detector_ids[:,0].to(torch.long)].T
+    x2, y2, _ = scanner_LUT[detector_ids[:,1].to(torch.long)].T
+    radius = torch.where((x1==x2)*(y1==y2), torch.sqrt(x1**2+y1**2), (x1*y2-y1*x2)/torch.sqrt((x1-x2)**2+(y1-y2)**2))
+    return 1/(torch.sqrt(1-(torch.abs(radius) / cylinder_radius)**2) + pytomography.delta)
+
+def _get_pair_exposure(detector_ids: torch.Tensor, info: dict, cylinder_radius: float | None = None) -> torch.Tensor:
+    """Helper function to ``ComponentNormalization``: obtains the relative exposure (chord length through the calibration phantom) of detector pairs, which is 0 for pairs not intersecting the phantom
+
+    Args:
+        detector_ids (torch.Tensor): Detector ID pairs
+        info (dict): PET geometry information dictionary
+        cylinder_radius (float | None, optional): Radius of cylindrical phantom used in scan. If None, all pairs have an exposure of 1. Defaults to None.
+
+    Returns:
+        torch.Tensor: Exposure of each pair
+    """
+    if cylinder_radius is None:
+        return torch.ones(detector_ids.shape[0], dtype=torch.float64)
+    exposure = 1 / _get_cylinder_geometric_factor(detector_ids, get_scanner_LUT(info), cylinder_radius).to(torch.float64)
+    return torch.nan_to_num(exposure, nan=0.0)
+
+@_cache_geometry_tables(num_tables=1)
+def _get_symmetry_class_exposure(info: dict, cylinder_radius: float | None = None) -> torch.Tensor:
+    """Helper function to ``ComponentNormalization``: obtains the total exposure of the detector pairs in each bin of the symmetry histogram by streaming over all detector pairs (the number of pairs in each bin if ``cylinder_radius`` is None)
+
+    Args:
+        info (dict): PET geometry information dictionary
+        cylinder_radius (float | None, optional): Radius of cylindrical phantom used in scan. Defaults to None.
+
+    Returns:
+        torch.Tensor: Total exposure of each (flattened) symmetry histogram bin
+    """
+    num_classes = int(np.prod(_get_symmetry_class_shape(info)))
+    exposure = torch.zeros(num_classes, dtype=torch.float64)
+    for pairs in iterate_detector_pair_combinations(get_scanner_LUT(info).shape[0]):
+        exposure += torch.bincount(_get_symmetry_class_index(pairs, info), weights=_get_pair_exposure(pairs, info, cylinder_radius), minlength=num_classes)
+    return exposure
+
+class ComponentNormalization:
+    r"""Component-based normalization model. The normalization weight of the LOR between crystals :math:`i` and :math:`j` is :math:`\epsilon_i \epsilon_j b_{c(i,j)}`, where :math:`\epsilon` are crystal efficiencies and :math:`b` are block factors for each detector pair symmetry class :math:`c` (same classes as ``gate.get_normalization_weights_cylinder_calibration``). Only the components are stored (a few values per crystal), and weights are evaluated on the fly for any detector pairs.
+
+    Args:
+        crystal_efficiencies (torch.Tensor): Efficiency of each crystal (shape [N_detectors])
+        block_factors (torch.Tensor): Factor of each symmetry class (flattened symmetry histogram)
+        info (dict): PET geometry information dictionary
+    """
+    def __init__(
+        self,
+        crystal_efficiencies: torch.Tensor,
+        block_factors: torch.Tensor,
+        info: dict
+        ) -> None:
+        self.crystal_efficiencies = crystal_efficiencies
+        self.block_factors = block_factors
+        self.info = info
+
+    @staticmethod
+    def _fit_block_factors(
+        detector_ids: torch.Tensor | np.ndarray | Iterable,
+        weights: torch.Tensor | np.ndarray | Iterable | None,
+        crystal_efficiencies: torch.Tensor,
+        info: dict,
+        cylinder_radius: float | None,
+        chunk_size: int
+        ) -> torch.Tensor:
+        """Efficiency corrected number of events of each symmetry class divided by the total exposure of the class"""
+        class_exposure = _get_symmetry_class_exposure(info, cylinder_radius)
+        histo = torch.zeros(class_exposure.shape[0], dtype=torch.float64)
+        for detector_ids_chunk, weights_chunk in _iterate_weighted_listmode_chunks(detector_ids, weights, chunk_size):
+            detector_ids_chunk = detector_ids_chunk[:,:2].to(torch.long)
+            event_weights = 1 / (crystal_efficiencies[detector_ids_chunk[:,0]] * crystal_efficiencies[detector_ids_chunk[:,1]]).clamp(min=1e-12)
+            if weights_chunk is not None:
+                event_weights *= weights_chunk.to(torch.float64)
+            histo.index_add_(0, _get_symmetry_class_index(detector_ids_chunk, info), event_weights)
+        return torch.where(class_exposure>0, histo / class_exposure.clamp(min=1e-12), 0)
+
+    @classmethod
+    def fit(
+        cls,
+        detector_ids: torch.Tensor | np.ndarray | Iterable,
+        info: dict,
+        cylinder_radius: float | None = None,
+        weights: torch.Tensor | np.ndarray | Iterable | None = None,
+        num_iterations: int = 0,
+        chunk_size: int = 10000000
+        ) -> ComponentNormalization:
+        """Fits the components to the listmode data of a normalization (calibration) scan. Crystal efficiencies are initialized as the fan sums (number of events involving each crystal) divided by the mean fan sum of all crystals that are rotations of it (same ring and same position within the rsector), which costs O(events + crystals). Block factors are the efficiency corrected number of events of each symmetry class divided by the total exposure of its detector pairs. Optionally, crystal efficiencies are refined by solving :math:`F_i = \\epsilon_i \\sum_j \\epsilon_j b_{c(i,j)} x_{ij}` (:math:`x` being the exposure) by fixed point iteration, which removes the ambiguity of the mean efficiency of each rotation group but requires a pass over all detector pairs per iteration.
+
+        Args:
+            detector_ids (torch.Tensor | np.ndarray | Iterable): Listmode detector IDs of the normalization scan (array-like or iterable of chunks, see ``listmode_to_sinogram_streaming``). Since the data is read several times, iterables of chunks must be re-iterable (e.g. a list rather than a generator).
+            info (dict): PET geometry information dictionary
+            cylinder_radius (float | None, optional): Radius of cylindrical phantom used in the calibration scan, used to correct for the exposure of each LOR. If None, uniform exposure is assumed. Defaults to None.
+            weights (torch.Tensor | np.ndarray | Iterable | None, optional): Weights of each event. Defaults to None.
+            num_iterations (int, optional): Number of fixed point iterations refining the crystal efficiencies. Defaults to 0.
+            chunk_size (int, optional): Number of events (or detector pairs) processed at a time. Defaults to 10000000.
+
+        Returns:
+            ComponentNormalization: Fitted normalization model
+        """
+        num_detectors = get_scanner_LUT(info).shape[0]
+        nr_crystals_per_rsector = info['NrCrystalsPerRing'] // info['rsectorTransNr']
+        # Crystal efficiencies from fan sums
+        fan_sum = torch.zeros(num_detectors, dtype=torch.float64)
+        for detector_ids_chunk, weights_chunk in _iterate_weighted_listmode_chunks(detector_ids, weights, chunk_size):
+            weights_chunk = None if weights_chunk is None else weights_chunk.to(torch.float64).repeat(2)
+            fan_sum += torch.bincount(detector_ids_chunk[:,:2].T.reshape(-1).to(torch.long), weights=weights_chunk, minlength=num_detectors)
+        fan_sum_groups = fan_sum.reshape(info['NrRings'], info['rsectorTransNr'], nr_crystals_per_rsector)
+        crystal_efficiencies = (fan_sum_groups / fan_sum_groups.mean(dim=1, keepdim=True).clamp(min=1e-12)).ravel()
+        block_factors = cls._fit_block_factors(detector_ids, weights, crystal_efficiencies, info, cylinder_radius, chunk_size)
+        for _ in range(num_iterations):
+            fan_expected = torch.zeros(num_detectors, dtype=torch.float64)
+            for pairs in iterate_detector_pair_combinations(num_detectors, chunk_size):
+                pair_factors = block_factors[_get_symmetry_class_index(pairs, info)] * _get_pair_exposure(pairs, info, cylinder_radius)
+                fan_expected.index_add_(0, pairs[:,0], pair_factors * crystal_efficiencies[pairs[:,1]])
+                fan_expected.index_add_(0, pairs[:,1], pair_factors * crystal_efficiencies[pairs[:,0]])
+            crystal_efficiencies = fan_sum / fan_expected.clamp(min=1e-12)
+            crystal_efficiencies /= crystal_efficiencies[fan_sum>0].mean()
+            block_factors = cls._fit_block_factors(detector_ids, weights, crystal_efficiencies, info, cylinder_radius, chunk_size)
+        return cls(crystal_efficiencies.to(torch.float32), block_factors.to(torch.float32), info)
+
+    def get_weights(self, detector_ids: torch.Tensor) -> torch.Tensor:
+        """Evaluates the normalization weights of detector pairs
+
+        Args:
+            detector_ids (torch.Tensor): Detector ID pairs (for instance ``torch.combinations(torch.arange(N_detectors), 2)`` or blocks of ``iterate_detector_pair_combinations``)
+
+        Returns:
+            torch.Tensor: Normalization weight of each pair
+        """
+        detector_ids = detector_ids[:,:2].to(torch.long)
+        return self.crystal_efficiencies[detector_ids[:,0]] * self.crystal_efficiencies[detector_ids[:,1]] * self.block_factors[_get_symmetry_class_index(detector_ids, self.info)]
+
+    def save(self, path: str) -> None:
+        """Saves the components (together with the hash of the geometry they were fitted for)
+
+        Args:
+            path (str): Path of saved file
+        """
+        torch.save({'crystal_efficiencies': self.crystal_efficiencies, 'block_factors': self.block_factors, 'geometry_hash': get_geometry_hash(self.info)}, path)
+
+    @classmethod
+    def load(cls, path: str, info: dict) -> ComponentNormalization:
+        """Loads components saved with ``save``
+
+        Args:
+            path (str): Path of saved file
+            info (dict): PET geometry information dictionary (must match the geometry the components were fitted for)
+
+        Returns:
+            ComponentNormalization: Normalization model
+        """
+        components = torch.load(path, weights_only=True)
+        if components['geometry_hash'] != get_geometry_hash(info):
+            raise ValueError(f'Normalization components in {path} were fitted for a different scanner geometry')
+        return cls(components['crystal_efficiencies'], components['block_factors'], info)
+
 def randoms_sinogram_to_sinogramTOF(
     sinogram_random: torch.Tenor,
     tof_meta: PETTOFMeta,
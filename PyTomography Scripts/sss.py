@@ -1,5 +1,9 @@
 from __future__ import annotations
 from typing import Sequence
+from collections import OrderedDict
+import os
+import hashlib
+import warnings
 import torch
 import pytomography
 from pytomography.io.PET import shared
@@ -7,7 +11,7 @@ from pytomography.projectors.PET import PETLMSystemMatrix
 import numpy as np
 import parallelproj
 from torchrbf import RBFInterpolator
-from torch.nn.functional import grid_sample
+from torch.nn.functional import grid_sample, avg_pool3d
 from pytomography.io.PET.shared import sinogram_coordinates, sinogram_to_spatial, listmode_to_sinogram
 from pytomography.projectors.PET import create_sinogramSM_from_LMSM
 from pytomography.metadata.PET import PETTOFMeta
@@ -91,6 +95,224 @@ def tof_efficiency(
     prob = prob / prob.sum(dim=0).unsqueeze(0)
     return prob
 
+def get_interpolation_table(values: torch.Tensor) -> torch.Tensor:
+    """Obtains a table used for linear interpolation of functions sampled on a uniform grid. For each function, the table stores the value and the slope to the next grid point as contiguous rows, so that the interpolation only requires one gather per row.
+
+    Args:
+        values (torch.Tensor): Function values at the grid points, of shape :math:`(N_{samples}, N_{functions})`
+
+    Returns:
+        torch.Tensor: Interpolation table of shape :math:`(2N_{functions}, N_{samples}-1)`
+    """
+    return torch.stack([values[:-1], values[1:] - values[:-1]], dim=-1).flatten(start_dim=1).T.contiguous()
+
+def interpolate_table(
+    table: torch.Tensor,
+    x: torch.Tensor,
+    x_min: float,
+    spacing: float
+    ) -> Sequence[torch.Tensor]:
+    """Evaluates all functions of a table obtained via ``get_interpolation_table`` using linear interpolation. Values outside the sampled grid are clamped to the first/last sample.
+
+    Args:
+        table (torch.Tensor): Interpolation table
+        x (torch.Tensor): Positions at which the functions are evaluated
+        x_min (float): Position of the first grid point
+        spacing (float): Spacing between the grid points
+
+    Returns:
+        Sequence[torch.Tensor]: Interpolated values of each function, with the same shape as ``x``.
+    """
+    position = ((x - x_min) / spacing).clamp_(0, table.shape[1])
+    idx = position.to(torch.int64).clamp_(max=table.shape[1] - 1)
+    w = position - idx
+    idx = idx.ravel()
+    return [table[2*i].index_select(0, idx).view_as(w) + w * table[2*i+1].index_select(0, idx).view_as(w) for i in range(table.shape[0] // 2)]
+
+class ScatterPhysicsLUT:
+    r"""Lookup table of the physics terms of single scatter simulation as a function of the cosine of the scattering angle. For a 511keV photon scattering with angle :math:`\theta`, all physics terms only depend on :math:`\cos\theta`, so they are tabulated once on a uniform grid over :math:`[-1, 1]` and evaluated for each scatter point and LOR pair by linear interpolation. The table stores (i) the angular factor :math:`\epsilon(E') \frac{d\sigma}{d\omega}(\theta) / \sigma(511)`, where :math:`\epsilon` is the detector efficiency at the scattered energy :math:`E'`, and (ii) the total compton cross section ratio :math:`\sigma(E') / \sigma(511)` used to scale the attenuation after scattering. Upon construction, the table is compared to the analytic functions halfway between the samples (where the linear interpolation error is largest) and a ``UserWarning`` is issued if the relative error exceeds ``tolerance``.
+
+    Args:
+        energy_resolution (float, optional): Energy resolution of the crystals (represented as a fraction of 511keV). Defaults to 0.15.
+        energy_threshhold (float, optional): Lower limit of energies detected by the crystal which are registered as events. Defaults to 430.
+        num_samples (int, optional): Number of samples of :math:`\cos\theta` in the table. Defaults to 4096.
+        tolerance (float, optional): Maximum relative interpolation error (with respect to the maximum of each term) before a ``UserWarning`` is issued. Defaults to 1e-3.
+    """
+    def __init__(
+        self,
+        energy_resolution: float = 0.15,
+        energy_threshhold: float = 430,
+        num_samples: int = 4096,
+        tolerance: float = 1e-3
+        ) -> None:
+        self.energy_resolution = energy_resolution
+        self.energy_threshhold = energy_threshhold
+        self.num_samples = num_samples
+        cos_theta = torch.linspace(-1, 1, num_samples, dtype=torch.float64)
+        values = self._compute_terms(cos_theta)
+        self.table = get_interpolation_table(values).to(torch.float32).to(pytomography.device)
+        self.max_relative_error = self._get_max_relative_error(values)
+        if self.max_relative_error > tolerance:
+            warnings.warn(f"Scatter physics lookup table has a relative interpolation error of {self.max_relative_error:.2e}, which exceeds the tolerance of {tolerance:.2e}: consider increasing num_samples", stacklevel=2)
+
+    def _compute_terms(self, cos_theta: torch.Tensor) -> torch.Tensor:
+        """Helper function to ``ScatterPhysicsLUT``: evaluates the analytic angular factor and compton cross section ratio at the given scattering angle cosines.
+
+        Args:
+            cos_theta (torch.Tensor): Cosine of the scattering angle
+
+        Returns:
+            torch.Tensor: Angular factor and compton cross section ratio (last dimension)
+        """
+        E_PET = torch.tensor(511, dtype=cos_theta.dtype)
+        E_new = photon_energy_after_compton_scatter_511kev(cos_theta)
+        total_compton_cross_section_511keV = total_compton_cross_section(E_PET)
+        angular_factor = detector_efficiency(E_new, self.energy_resolution, self.energy_threshhold) * diff_compton_cross_section(cos_theta, E_PET) / total_compton_cross_section_511keV
+        compton_cross_section_ratio = total_compton_cross_section(E_new) / total_compton_cross_section_511keV
+        return torch.stack([angular_factor, compton_cross_section_ratio], dim=-1)
+
+    def _get_max_relative_error(self, values: torch.Tensor) -> float:
+        """Helper function to ``ScatterPhysicsLUT``: obtains the maximum relative error of the table halfway between the samples with respect to the analytic functions.
+
+        Args:
+            values (torch.Tensor): Analytic terms at the sampled scattering angle cosines
+
+        Returns:
+            float: Maximum relative error (with respect to the maximum of each term)
+        """
+        cos_theta = torch.linspace(-1, 1, self.num_samples, dtype=torch.float64)
+        cos_theta_mid = (cos_theta[1:] + cos_theta[:-1]) / 2
+        values_mid = self._compute_terms(cos_theta_mid)
+        values_interpolated = self(cos_theta_mid.to(torch.float32).to(pytomography.device))
+        error = torch.stack([
+            (interpolated.cpu().to(torch.float64) - values_mid[:,i]).abs().max() / values[:,i].abs().max()
+            for i, interpolated in enumerate(values_interpolated)
+        ])
+        return error.max().item()
+
+    def __call__(self, cos_theta: torch.Tensor) -> Sequence[torch.Tensor, torch.Tensor]:
+        r"""Evaluates the physics terms at the given scattering angle cosines.
+
+        Args:
+            cos_theta (torch.Tensor): Cosine of the scattering angle (any shape)
+
+        Returns:
+            Sequence[torch.Tensor, torch.Tensor]: Angular factor :math:`\epsilon(E') \frac{d\sigma}{d\omega} / \sigma(511)` and compton cross section ratio :math:`\sigma(E') / \sigma(511)`, each with the same shape as ``cos_theta``.
+        """
+        angular_factor, compton_cross_section_ratio = interpolate_table(self.table, cos_theta, -1, 2 / (self.num_samples - 1))
+        return angular_factor, compton_cross_section_ratio
+
+_scatter_physics_luts = {}
+
+def get_scatter_physics_lut(
+    energy_resolution: float = 0.15,
+    energy_threshhold: float = 430,
+    num_samples: int = 4096,
+    tolerance: float = 1e-3
+    ) -> ScatterPhysicsLUT:
+    r"""Obtains the scatter physics lookup table corresponding to the given detector properties. Tables are stored in memory so that they are only computed once per set of parameters.
+
+    Args:
+        energy_resolution (float, optional): Energy resolution of the crystals (represented as a fraction of 511keV). Defaults to 0.15.
+        energy_threshhold (float, optional): Lower limit of energies detected by the crystal which are registered as events. Defaults to 430.
+        num_samples (int, optional): Number of samples of :math:`\cos\theta` in the table. Defaults to 4096.
+        tolerance (float, optional): Maximum relative interpolation error of the table before a ``UserWarning`` is issued. Defaults to 1e-3.
+
+    Returns:
+        ScatterPhysicsLUT: Scatter physics lookup table
+    """
+    key = (float(energy_resolution), float(energy_threshhold), int(num_samples), float(tolerance), str(pytomography.device))
+    if key not in _scatter_physics_luts:
+        _scatter_physics_luts[key] = ScatterPhysicsLUT(energy_resolution, energy_threshhold, num_samples, tolerance)
+    return _scatter_physics_luts[key]
+
+def tof_bin_probability_antiderivative(
+    distance: torch.Tensor,
+    tof_meta: PETTOFMeta
+    ) -> torch.Tensor:
+    r"""Computes an antiderivative (with respect to position along the LOR) of the probability that a coincidence event is detected in a TOF bin. For an event at distance :math:`x` from the center of a TOF bin of width :math:`w`, this probability is :math:`\frac{1}{2}\left[\text{erf}\left(\frac{x+w/2}{\sqrt{2}\sigma}\right) - \text{erf}\left(\frac{x-w/2}{\sqrt{2}\sigma}\right)\right]`, which can be integrated analytically using :math:`\int \text{erf}(u)du = u\,\text{erf}(u) + e^{-u^2}/\sqrt{\pi}`. The returned value is scaled by :math:`2/(\sqrt{2}\sigma)` and the linear part is evaluated exactly (as opposed to as the difference of two large terms) to avoid cancellation far away from the bin.
+
+    Args:
+        distance (torch.Tensor): Distance :math:`x` between the event position and the center of the TOF bin (in spatial units)
+        tof_meta (PETTOFMeta): TOF metadata for the sinogram
+
+    Returns:
+        torch.Tensor: Scaled antiderivative evaluated at ``distance``. The mean probability over a segment :math:`[a, b]` is :math:`\frac{\sqrt{2}\sigma}{2} \frac{F(b)-F(a)}{b-a}`.
+    """
+    scale = np.sqrt(2) * tof_meta.sigma.item()
+    bin_width = float(tof_meta.bin_width)
+    def nonlinear_part(u):
+        u = u.abs()
+        return torch.exp(-u**2) / np.sqrt(np.pi) - u * torch.erfc(u)
+    return (torch.clamp(2*distance, -bin_width, bin_width) + scale * (nonlinear_part((distance + bin_width/2) / scale) - nonlinear_part((distance - bin_width/2) / scale))) / scale
+
+class TOFBinProbabilityLUT:
+    """Lookup table of ``tof_bin_probability_antiderivative``, which avoids evaluating the error functions for every TOF bin, LOR pair and dense TOF segment. The antiderivative is constant (up to numerical precision) further than :math:`8\\sigma` from the bin edges, so it is only tabulated within this range and clamped outside of it.
+
+    Args:
+        tof_meta (PETTOFMeta): TOF metadata for the sinogram
+        num_samples (int, optional): Number of samples in the table. Defaults to 4096.
+    """
+    def __init__(self, tof_meta: PETTOFMeta, num_samples: int = 4096) -> None:
+        self.distance_max = float(tof_meta.bin_width) / 2 + 8 * tof_meta.sigma.item()
+        self.spacing = 2 * self.distance_max / (num_samples - 1)
+        distance = torch.linspace(-self.distance_max, self.distance_max, num_samples, dtype=torch.float64)
+        self.table = get_interpolation_table(tof_bin_probability_antiderivative(distance, tof_meta).unsqueeze(-1)).to(torch.float32).to(pytomography.device)
+
+    def __call__(self, distance: torch.Tensor) -> torch.Tensor:
+        """Evaluates the antiderivative at the given distances from the center of the TOF bin.
+
+        Args:
+            distance (torch.Tensor): Distance between the event position and the center of the TOF bin (in spatial units)
+
+        Returns:
+            torch.Tensor: Scaled antiderivative evaluated at ``distance``
+        """
+        return interpolate_table(self.table, distance, -self.distance_max, self.spacing)[0]
+
+_tof_bin_probability_luts = {}
+
+def get_tof_bin_probability_lut(tof_meta: PETTOFMeta, num_samples: int = 4096) -> TOFBinProbabilityLUT:
+    """Obtains the lookup table of the TOF bin probability antiderivative corresponding to the TOF bin width and resolution of ``tof_meta``. Tables are stored in memory so that they are only computed once per TOF configuration.
+
+    Args:
+        tof_meta (PETTOFMeta): TOF metadata for the sinogram
+        num_samples (int, optional): Number of samples in the table. Defaults to 4096.
+
+    Returns:
+        TOFBinProbabilityLUT: Lookup table of the TOF bin probability antiderivative
+    """
+    key = (float(tof_meta.bin_width), tof_meta.sigma.item(), int(num_samples), str(pytomography.device))
+    if key not in _tof_bin_probability_luts:
+        _tof_bin_probability_luts[key] = TOFBinProbabilityLUT(tof_meta, num_samples)
+    return _tof_bin_probability_luts[key]
+
+def get_tof_emission_integrals(
+    emission_integrals: torch.Tensor,
+    segment_length: torch.Tensor,
+    offset: torch.Tensor,
+    tof_meta: PETTOFMeta
+    ) -> torch.Tensor:
+    r"""Partitions the emission integrals between scatter points and detectors into TOF bins (Watson(2007) Equation 2). The emission integrals are given over consecutive segments of equal length starting at the scatter point; each segment is integrated analytically against the TOF bin response (see ``tof_bin_probability_antiderivative``, evaluated via ``TOFBinProbabilityLUT``), assuming uniform activity within the segment. Segments are accumulated one at a time so that memory does not scale with the number of segments.
+
+    Args:
+        emission_integrals (torch.Tensor): Emission integrals over each segment between the scatter points and the detectors for each LOR pair, of shape :math:`(K, N_{coinc}, N_{denseTOF})`.
+        segment_length (torch.Tensor): Length of the segments, of shape :math:`(K, N_{coinc})`
+        offset (torch.Tensor): Distance from the scatter point (along the line towards the detector) at which an event is measured in the center of each TOF bin, of shape :math:`(N_{TOF}, K, N_{coinc})`
+        tof_meta (PETTOFMeta): TOF metadata for the sinogram
+
+    Returns:
+        torch.Tensor: Emission integrals partitioned into each TOF bin, of shape :math:`(N_{TOF}, K, N_{coinc})`
+    """
+    tof_bin_probability_lut = get_tof_bin_probability_lut(tof_meta)
+    antiderivative_previous = tof_bin_probability_lut(-offset)
+    emission_integrals_tof = torch.zeros_like(offset)
+    for i in range(emission_integrals.shape[-1]):
+        antiderivative = tof_bin_probability_lut(segment_length * (i+1) - offset)
+        emission_integrals_tof += emission_integrals[...,i] * (antiderivative - antiderivative_previous)
+        antiderivative_previous = antiderivative
+    return emission_integrals_tof * (np.sqrt(2) * tof_meta.sigma.item() / 2 / segment_length)
+
 def get_sample_scatter_points(
     attenuation_map: torch.Tensor,
     stepsize: float = 4,
@@ -112,6 +334,149 @@ def get_sample_scatter_points(
     coords = coords[:,idx_above_cutoff]
     return coords.to(pytomography.device)
 
+def get_importance_sample_scatter_points(
+    attenuation_map: torch.Tensor,
+    pet_image: torch.Tensor,
+    num_points: int,
+    attenuation_cutoff: float = 0.004,
+    coarse_stepsize: int = 4,
+    uniform_fraction: float = 0.5,
+    generator: torch.Generator | None = None
+    ) -> Sequence[torch.Tensor, torch.Tensor]:
+    r"""Selects scatter points by importance sampling voxels of the attenuation map above ``attenuation_cutoff``. Voxels are drawn with probability proportional to :math:`\mu` times the local activity, where the local activity is obtained from a coarse (block averaged) version of ``pet_image``. To keep the estimate unbiased in regions of low activity (which may still scatter activity from elsewhere), this distribution is mixed with a uniform distribution over all candidate voxels. Voxels drawn multiple times are only returned once, and each returned point has a weight such that the weighted mean over the returned points is an unbiased estimate of the (unweighted) mean over all candidate voxels.
+
+    Args:
+        attenuation_map (torch.Tensor): Attenuation map
+        pet_image (torch.Tensor): PET image used to estimate the scatter
+        num_points (int): Number of points drawn (before merging duplicates)
+        attenuation_cutoff (float, optional): Only consider points above this threshhold. Defaults to 0.004.
+        coarse_stepsize (int, optional): Block size in x/y/z used to average ``pet_image`` for the local activity. Defaults to 4.
+        uniform_fraction (float, optional): Fraction of the sampling distribution that is uniform over all candidate voxels. Defaults to 0.5.
+        generator (torch.Generator | None, optional): Random number generator used for sampling. Defaults to None.
+
+    Returns:
+        Sequence[torch.Tensor, torch.Tensor]: Tensor of coordinates and the corresponding weight of each point
+    """
+    coords = torch.nonzero(attenuation_map > attenuation_cutoff).T
+    num_candidates = coords.shape[1]
+    activity_coarse = avg_pool3d(pet_image.clamp(min=0).unsqueeze(0).unsqueeze(0), coarse_stepsize, ceil_mode=True)[0,0]
+    importance = (attenuation_map[tuple(coords)] * activity_coarse[tuple(torch.div(coords, coarse_stepsize, rounding_mode='floor'))]).cpu().to(torch.float64)
+    if importance.sum() > 0:
+        sampling_probability = uniform_fraction / num_candidates + (1 - uniform_fraction) * importance / importance.sum()
+    else:
+        sampling_probability = torch.full((num_candidates,), 1 / num_candidates, dtype=torch.float64)
+    # Systematic (stratified) inverse transform sampling: candidates are ordered spatially, so this also spreads the points over the attenuation map
+    cdf = torch.cumsum(sampling_probability, dim=0)
+    samples = torch.searchsorted(cdf, (torch.arange(num_points, dtype=torch.float64) + torch.rand(1, generator=generator, dtype=torch.float64)) / num_points * cdf[-1]).clamp_(max=num_candidates-1)
+    idx, multiplicity = torch.unique(samples, return_counts=True)
+    weights = multiplicity / (num_candidates * sampling_probability[idx]) * len(idx) / num_points
+    return coords[:,idx.to(coords.device)], weights.to(torch.float32).to(pytomography.device)
+
+def prune_scatter_points(
+    contributions: torch.Tensor,
+    threshold: float,
+    generator: torch.Generator | None = None
+    ) -> Sequence[torch.Tensor, torch.Tensor]:
+    """Prunes scatter points whose (estimated) contribution is below ``threshold`` using Russian roulette: such points are only kept with probability ``contributions / threshold``, and the weights of the points that are kept are scaled by the inverse of this probability. As such, the pruned estimate remains unbiased.
+
+    Args:
+        contributions (torch.Tensor): Estimated contribution of each scatter point
+        threshold (float): Contribution below which scatter points are pruned
+        generator (torch.Generator | None, optional): Random number generator used for pruning. Defaults to None.
+
+    Returns:
+        Sequence[torch.Tensor, torch.Tensor]: Boolean mask of the scatter points that are kept, and the weight scaling of each kept point
+    """
+    survival_probability = (contributions / threshold).clamp(max=1)
+    keep = torch.rand(contributions.shape[0], generator=generator).to(contributions.device) < survival_probability
+    return keep, 1 / survival_probability[keep]
+
+class _ScatterPointPruner:
+    """Helper class to the SSS kernels: prunes each batch of scatter points (see ``prune_scatter_points``) relative to the mean estimated contribution of all scatter points processed so far, and reports the number of pruned points.
+
+    Args:
+        pruning_tolerance (float): Scatter points with an estimated contribution below this fraction of the mean contribution are pruned. If 0, no pruning is performed.
+        generator (torch.Generator | None): Random number generator used for pruning
+    """
+    def __init__(self, pruning_tolerance: float, generator: torch.Generator | None) -> None:
+        self.pruning_tolerance = pruning_tolerance
+        self.generator = generator
+        self.contributions_total = 0
+        self.num_points = 0
+        self.num_pruned = 0
+
+    def __call__(
+        self,
+        mu_values: torch.Tensor,
+        emission_integrals: torch.Tensor,
+        log_transmission: torch.Tensor,
+        *tensors: torch.Tensor
+        ) -> Sequence[torch.Tensor]:
+        """Prunes a batch of scatter points. The contribution of each point is estimated from its emission integrals and log-transmission to all detectors.
+
+        Args:
+            mu_values (torch.Tensor): Weighted attenuation coefficient at each scatter point (shape :math:`(K, 1)`)
+            emission_integrals (torch.Tensor): Emission integrals between each scatter point and each detector (shape :math:`(K, N_{detectors})`, or :math:`(K, N_{detectors}, N_{segments})` for TOF)
+            log_transmission (torch.Tensor): Log-transmission between each scatter point and each detector (shape :math:`(K, N_{detectors})`)
+            tensors (torch.Tensor): Other per scatter point tensors to prune
+
+        Returns:
+            Sequence[torch.Tensor]: ``mu_values`` (scaled by the survival weights), ``emission_integrals``, ``log_transmission`` and ``tensors`` of the kept scatter points
+        """
+        if self.pruning_tolerance <= 0:
+            return (mu_values, emission_integrals, log_transmission, *tensors)
+        K = mu_values.shape[0]
+        emission_integrals_total = emission_integrals if emission_integrals.dim() == 2 else emission_integrals.sum(dim=-1)
+        contributions = mu_values[:,0] * (emission_integrals_total * torch.exp(log_transmission)).sum(dim=1)
+        self.contributions_total += contributions.sum().item()
+        self.num_points += K
+        keep, survival_weights = prune_scatter_points(contributions, self.pruning_tolerance * self.contributions_total / self.num_points, self.generator)
+        self.num_pruned += K - len(survival_weights)
+        return (mu_values[keep] * survival_weights.unsqueeze(1), emission_integrals[keep], log_transmission[keep], *[tensor[keep] for tensor in tensors])
+
+    def report(self) -> None:
+        """Prints the number of pruned scatter points (if pruning is performed)
+        """
+        if self.pruning_tolerance > 0:
+            print(f"[SSS] Pruned {self.num_pruned} of {self.num_points} scatter points")
+
+def _get_scatter_point_setup(
+    object_meta: ObjectMeta,
+    pet_image: torch.Tensor,
+    attenuation_image: torch.Tensor,
+    image_stepsize: int,
+    attenuation_cutoff: float,
+    importance_sampling: bool,
+    num_scatter_points: int | None,
+    generator: torch.Generator | None
+    ) -> Sequence[torch.Tensor, torch.Tensor, torch.Tensor]:
+    """Helper function to the SSS kernels: obtains the scatter points, either every ``image_stepsize``-th voxel (see ``get_sample_scatter_points``) or by importance sampling (see ``get_importance_sample_scatter_points``), and their spatial positions (with a random offset within each voxel).
+
+    Args:
+        object_meta (ObjectMeta): Object metadata corresponding to the PET image and attenuation map
+        pet_image (torch.Tensor): PET image used to estimate the scatter
+        attenuation_image (torch.Tensor): Attenuation map used in scatter simulation
+        image_stepsize (int): Stepsize in x/y/z between sampled scatter points (block size of the coarse activity image for importance sampling)
+        attenuation_cutoff (float): Only consider points above this threshhold
+        importance_sampling (bool): Whether or not to draw the scatter points by importance sampling
+        num_scatter_points (int | None): Number of scatter points drawn by importance sampling. If None, the number of points obtained with ``image_stepsize`` is used.
+        generator (torch.Generator | None): Random number generator used for sampling and for the offsets
+
+    Returns:
+        Sequence[torch.Tensor, torch.Tensor, torch.Tensor]: Voxel coordinates of the scatter points (shape :math:`(3, N_{points})`), their sampling weights and their spatial positions (shape :math:`(N_{points}, 3)`)
+    """
+    dr = torch.tensor(object_meta.dr)
+    shape = torch.tensor(object_meta.shape)
+    coords = get_sample_scatter_points(attenuation_image, stepsize=image_stepsize, attenuation_cutoff=attenuation_cutoff)
+    scatter_point_weights = torch.ones(coords.shape[1]).to(pytomography.device)
+    if importance_sampling:
+        if num_scatter_points is None:
+            num_scatter_points = coords.shape[1]
+        coords, scatter_point_weights = get_importance_sample_scatter_points(attenuation_image, pet_image, num_scatter_points, attenuation_cutoff, image_stepsize, generator=generator)
+    coords_position = (coords - shape.unsqueeze(1).to(pytomography.device)/2 + 0.5) * dr.unsqueeze(1).to(pytomography.device)
+    scatter_point_positions = coords_position.T + ((torch.rand(coords.shape[1], 3, generator=generator) - 0.5) * dr).to(pytomography.device)
+    return coords, scatter_point_weights, scatter_point_positions
+
 def get_sample_detector_ids(
     proj_meta: ProjMeta,
     sinogram_interring_stepsize: int = 4,
@@ -135,7 +500,356 @@ def get_sample_detector_ids(
     idx = torch.cartesian_prod(idx_ring, idx_intraring).T
     idx = idx[1] + idx[0]*proj_meta.info['NrCrystalsPerRing']
     return idx_intraring, idx_ring, torch.combinations(idx.cpu(), 2)
+
+def get_sample_detector_positions(
+    scanner_LUT: torch.Tensor,
+    detector_ids_scatter: torch.Tensor,
+    sampled_detectors_only: bool = True
+    ) -> Sequence[torch.Tensor, torch.Tensor]:
+    """Obtains the spatial positions of the detectors used in the sparse SSS sinogram, along with the detector pair indices remapped into that set of positions. Only the sampled detectors are ever indexed by the LOR pairs, so restricting the line integrals to these detectors avoids projecting to every crystal in the scanner.
+
+    Args:
+        scanner_LUT (torch.Tensor): Scanner lookup table yielding the spatial coordinates of each detector ID
+        detector_ids_scatter (torch.Tensor): Detector ID pairs corresponding to all sampled LORs (obtained via the ``get_sample_detector_ids`` function)
+        sampled_detectors_only (bool, optional): Whether or not to only return the positions of the unique sampled detectors. If False, the full scanner lookup table is returned and the indices are left unchanged. Defaults to True.
+
+    Returns:
+        Sequence[torch.Tensor, torch.Tensor]: Detector positions used for the line integrals, and the (remapped) detector index pairs into these positions.
+    """
+    if sampled_detectors_only:
+        detector_ids_unique, detector_idx_pairs = torch.unique(detector_ids_scatter, return_inverse=True)
+        return scanner_LUT[detector_ids_unique], detector_idx_pairs
+    else:
+        return scanner_LUT, detector_ids_scatter
     
+def get_scatter_point_batch_size(
+    num_pairs: int,
+    num_detectors: int,
+    num_tof_bins: int = 1,
+    num_dense_tof_bins: int = 1,
+    memory_budget_GB: float = 1
+    ) -> int:
+    """Estimates the number of scatter points that can be evaluated simultaneously in the SSS kernels given a memory budget. The estimate is based on the number of (float32) elements of the largest intermediate tensors allocated for each scatter point.
+
+    Args:
+        num_pairs (int): Number of sampled LOR pairs in the sparse sinogram
+        num_detectors (int): Number of detectors used for the emission/transmission integrals
+        num_tof_bins (int, optional): Number of TOF bins processed simultaneously (1 for non-TOF). Defaults to 1.
+        num_dense_tof_bins (int, optional): Number of dense TOF bins used when partioning the emission integrals (1 for non-TOF). Defaults to 1.
+        memory_budget_GB (float, optional): Approximate memory (in GB) allowed for intermediate tensors. Defaults to 1.
+
+    Returns:
+        int: Number of scatter points per batch (at least 1)
+    """
+    if num_tof_bins > 1 or num_dense_tof_bins > 1:
+        elements_per_point = 24 * num_pairs + 4 * num_detectors * (num_dense_tof_bins + 1) + 2 * num_pairs * num_dense_tof_bins + 10 * num_tof_bins * num_pairs
+    else:
+        elements_per_point = 24 * num_pairs + 8 * num_detectors
+    return max(1, int(memory_budget_GB * 1e9 / (4 * elements_per_point)))
+
+_transmission_integrals_cache = OrderedDict()
+_transmission_integrals_cache_settings = {'maxsize': 4}
+
+def set_transmission_integrals_cache(maxsize: int = 4) -> None:
+    """Configures the in-memory transmission integral cache. Each entry holds the transmission integrals between all scatter points and detectors of one scatter simulation, so the number of entries is bounded.
+
+    Args:
+        maxsize (int, optional): Maximum number of entries kept in memory (least recently used entries are discarded first). Defaults to 4.
+    """
+    _transmission_integrals_cache_settings['maxsize'] = maxsize
+    while len(_transmission_integrals_cache) > maxsize:
+        _transmission_integrals_cache.popitem(last=False)
+
+def get_transmission_integrals_cache_key(
+    attenuation_image: torch.Tensor,
+    object_meta: ObjectMeta,
+    scatter_point_positions: torch.Tensor,
+    detector_positions: torch.Tensor
+    ) -> str:
+    """Obtains a key identifying a set of scatter point to detector transmission integrals. The key is a hash of the attenuation map content (and voxel size), the scatter point coordinates, and the detector positions.
+
+    Args:
+        attenuation_image (torch.Tensor): Attenuation map used in scatter simulation
+        object_meta (ObjectMeta): Object metadata corresponding to the attenuation map
+        scatter_point_positions (torch.Tensor): Spatial positions of all scatter points (shape :math:`(N_{points}, 3)`)
+        detector_positions (torch.Tensor): Spatial positions of all detectors considered (shape :math:`(N_{detectors}, 3)`)
+
+    Returns:
+        str: Hash of all inputs
+    """
+    hasher = hashlib.sha1()
+    hasher.update(np.array(object_meta.dr, dtype=np.float64).tobytes())
+    for tensor in [attenuation_image, scatter_point_positions, detector_positions]:
+        hasher.update(str(tuple(tensor.shape)).encode())
+        hasher.update(tensor.detach().to(torch.float32).cpu().contiguous().numpy().tobytes())
+    return hasher.hexdigest()
+
+def load_transmission_integrals(key: str, cache_dir: str | None = None) -> torch.Tensor | None:
+    """Loads cached transmission integrals corresponding to ``key`` from memory, or from ``cache_dir`` if they are not in memory.
+
+    Args:
+        key (str): Key obtained from ``get_transmission_integrals_cache_key``
+        cache_dir (str | None, optional): Directory of the on-disk cache. If None, only the in-memory cache is considered. Defaults to None.
+
+    Returns:
+        torch.Tensor | None: Cached log-transmission (see ``get_log_transmission_integrals``), or None if it has not been cached.
+    """
+    if key in _transmission_integrals_cache:
+        _transmission_integrals_cache.move_to_end(key)
+        return _transmission_integrals_cache[key]
+    if cache_dir is not None:
+        path = os.path.join(cache_dir, f'sss_log_transmission_{key}.pt')
+        if os.path.exists(path):
+            log_transmission = torch.load(path)
+            _add_transmission_integrals_to_cache(key, log_transmission)
+            return log_transmission
+    return None
+
+def _add_transmission_integrals_to_cache(key: str, log_transmission: torch.Tensor) -> None:
+    """Helper function to ``load_transmission_integrals`` and ``store_transmission_integrals``: adds an entry to the in-memory cache, discarding the least recently used entries beyond the maximum size (see ``set_transmission_integrals_cache``)
+
+    Args:
+        key (str): Key obtained from ``get_transmission_integrals_cache_key``
+        log_transmission (torch.Tensor): Log-transmission between all scatter points and detectors (see ``get_log_transmission_integrals``)
+    """
+    _transmission_integrals_cache[key] = log_transmission
+    _transmission_integrals_cache.move_to_end(key)
+    while len(_transmission_integrals_cache) > _transmission_integrals_cache_settings['maxsize']:
+        _transmission_integrals_cache.popitem(last=False)
+
+def store_transmission_integrals(key: str, log_transmission: torch.Tensor, cache_dir: str | None = None) -> None:
+    """Stores transmission integrals in the in-memory cache (bounded, see ``set_transmission_integrals_cache``), and in ``cache_dir`` if provided.
+
+    Args:
+        key (str): Key obtained from ``get_transmission_integrals_cache_key``
+        log_transmission (torch.Tensor): Log-transmission between all scatter points and detectors (see ``get_log_transmission_integrals``)
+        cache_dir (str | None, optional): Directory of the on-disk cache. If None, the integrals are only stored in memory. Defaults to None.
+    """
+    log_transmission = log_transmission.cpu()
+    _add_transmission_integrals_to_cache(key, log_transmission)
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        torch.save(log_transmission, os.path.join(cache_dir, f'sss_log_transmission_{key}.pt'))
+
+def clear_transmission_integrals_cache() -> None:
+    """Clears the in-memory transmission integral cache (the on-disk cache is left untouched)
+    """
+    _transmission_integrals_cache.clear()
+
+def _prepare_transmission_integrals_cache(
+    attenuation_image: torch.Tensor,
+    object_meta: ObjectMeta,
+    scatter_point_positions: torch.Tensor,
+    detector_positions: torch.Tensor,
+    cache_dir: str | None,
+    seed: int | None,
+    importance_sampling: bool
+    ) -> Sequence[str, torch.Tensor | None, torch.Tensor | None]:
+    """Helper function to the SSS kernels: obtains the cache key of the transmission integrals between all scatter points and detectors and loads them if they have been cached (see ``load_transmission_integrals``). Warns if the scatter points are unlikely to be the same in later calls.
+
+    Args:
+        attenuation_image (torch.Tensor): Attenuation map used in scatter simulation
+        object_meta (ObjectMeta): Object metadata corresponding to the attenuation map
+        scatter_point_positions (torch.Tensor): Spatial positions of all scatter points (shape :math:`(N_{points}, 3)`)
+        detector_positions (torch.Tensor): Spatial positions of all detectors considered (shape :math:`(N_{detectors}, 3)`)
+        cache_dir (str | None): Directory of the on-disk cache. If None, only the in-memory cache is considered.
+        seed (int | None): Seed used for the random offsets of the scatter points
+        importance_sampling (bool): Whether or not the scatter points are drawn by importance sampling
+
+    Returns:
+        Sequence[str, torch.Tensor | None, torch.Tensor | None]: Cache key, cached transmission integrals (None if they have not been cached) and an empty tensor in which the kernel stores the transmission integrals it computes (None if they have been cached)
+    """
+    if seed is None:
+        print("[WARNING] Transmission integrals are cached without a seed: scatter points will differ between calls and the cache will not be reused")
+    if importance_sampling:
+        print("[WARNING] Transmission integrals are cached with importance sampling: scatter points depend on the PET image and the cache will only be reused for the same PET image")
+    key = get_transmission_integrals_cache_key(attenuation_image, object_meta, scatter_point_positions, detector_positions)
+    log_transmission = load_transmission_integrals(key, cache_dir)
+    if log_transmission is not None:
+        return key, log_transmission.to(pytomography.device), None
+    return key, None, torch.empty((scatter_point_positions.shape[0], detector_positions.shape[0])).to(pytomography.device)
+
+def get_log_transmission_integrals(
+    scatter_point_positions: torch.Tensor,
+    detector_positions: torch.Tensor,
+    attenuation_image: torch.Tensor,
+    object_origin: np.ndarray,
+    dr: Sequence[float]
+    ) -> torch.Tensor:
+    r"""Computes the log-transmission :math:`-\int \mu dl` along the lines between each scatter point and each detector (the SSS kernels only use transmission in log space)
+
+    Args:
+        scatter_point_positions (torch.Tensor): Spatial positions of the scatter points (shape :math:`(K, 3)`)
+        detector_positions (torch.Tensor): Spatial positions of the detectors (shape :math:`(N_{detectors}, 3)`)
+        attenuation_image (torch.Tensor): Attenuation map used in scatter simulation
+        object_origin (np.ndarray): Spatial coordinate of the first voxel of the attenuation map
+        dr (Sequence[float]): Voxel size of the attenuation map
+
+    Returns:
+        torch.Tensor: Log-transmission of shape :math:`(K, N_{detectors})`
+    """
+    K = scatter_point_positions.shape[0]
+    transmission_integrals = parallelproj.joseph3d_fwd(
+        scatter_point_positions.unsqueeze(1).expand(-1, detector_positions.shape[0], -1).flatten(end_dim=1),
+        detector_positions.unsqueeze(0).expand(K, -1, -1).flatten(end_dim=1),
+        attenuation_image,
+        object_origin,
+        dr,
+    ).reshape((K, -1))
+    return -transmission_integrals
+
+def get_scatter_point_detector_geometry(
+    scatter_point_positions: torch.Tensor,
+    detector_positions: torch.Tensor,
+    detector_norm_xy: torch.Tensor
+    ) -> Sequence[torch.Tensor, torch.Tensor, torch.Tensor]:
+    """Computes the geometric quantities between each scatter point and each detector that are required by the SSS kernels. Each of these only depends on a single detector (as opposed to a detector pair), so they are evaluated once per scatter point and detector and subsequently gathered for the LOR pairs.
+
+    Args:
+        scatter_point_positions (torch.Tensor): Spatial positions of the scatter points (shape :math:`(K, 3)`)
+        detector_positions (torch.Tensor): Spatial positions of the detectors (shape :math:`(N_{detectors}, 3)`)
+        detector_norm_xy (torch.Tensor): Transaxial distance of each detector from the scanner axis (shape :math:`(N_{detectors},)`)
+
+    Returns:
+        Sequence[torch.Tensor, torch.Tensor, torch.Tensor]: Unit vectors from the scatter points to the detectors (shape :math:`(K, N_{detectors}, 3)`), the corresponding distances and the cosine of the angle of impingement upon the detectors (assumes a cylindrical scanner) (both of shape :math:`(K, N_{detectors})`).
+    """
+    rSD = detector_positions.unsqueeze(0) - scatter_point_positions.unsqueeze(1)
+    rSD_norm = torch.norm(rSD, dim=-1)
+    uSD = rSD / rSD_norm.unsqueeze(-1)
+    cos_theta_incidence = (uSD[...,:2]*detector_positions[:,:2]).sum(dim=-1) / detector_norm_xy
+    return uSD, rSD_norm, cos_theta_incidence
+
+def get_scattering_angle_cosine(
+    uSD: torch.Tensor,
+    idxA: torch.Tensor,
+    idxB: torch.Tensor
+    ) -> torch.Tensor:
+    """Computes the cosine of the scattering angle for each scatter point and LOR pair, given the unit vectors from each scatter point to each detector. The scattering angle is :math:`\\pi` minus the angle between the two vectors. The dot product is accumulated one component at a time to avoid gathering the full vectors for every LOR pair.
+
+    Args:
+        uSD (torch.Tensor): Unit vectors from the scatter points to the detectors (shape :math:`(K, N_{detectors}, 3)`)
+        idxA (torch.Tensor): Index of the first detector of each LOR pair
+        idxB (torch.Tensor): Index of the second detector of each LOR pair
+
+    Returns:
+        torch.Tensor: Cosine of the scattering angle (shape :math:`(K, N_{pairs})`)
+    """
+    cos_theta = 0
+    for i in range(uSD.shape[-1]):
+        cos_theta = cos_theta - uSD[...,i][:,idxA] * uSD[...,i][:,idxB]
+    return cos_theta
+
+def get_tail_pair_mask(
+    detector_positions: torch.Tensor,
+    detector_idx_pairs: torch.Tensor,
+    attenuation_image: torch.Tensor,
+    attenuation_cutoff: float,
+    object_origin: np.ndarray,
+    dr: Sequence[float]
+    ) -> torch.Tensor:
+    """Obtains the LOR pairs of the sparse sinogram that do not intersect the attenuation map above ``attenuation_cutoff`` (the tails of the sinogram). These are the regions used to scale the scatter estimate to the measured data (see ``scale_estimated_scatter``).
+
+    Args:
+        detector_positions (torch.Tensor): Spatial positions of the detectors (shape :math:`(N_{detectors}, 3)`)
+        detector_idx_pairs (torch.Tensor): Detector index pairs of each LOR into ``detector_positions``
+        attenuation_image (torch.Tensor): Attenuation map used in scatter simulation
+        attenuation_cutoff (float): Attenuation values above this threshold are considered part of the object
+        object_origin (np.ndarray): Spatial coordinate of the first voxel of the attenuation map
+        dr (Sequence[float]): Voxel size of the attenuation map
+
+    Returns:
+        torch.Tensor: Boolean mask of the tail LOR pairs. If no pair lies in the tails, all pairs are returned.
+    """
+    idxA, idxB = detector_idx_pairs.T
+    object_projection = parallelproj.joseph3d_fwd(
+        detector_positions[idxA],
+        detector_positions[idxB],
+        (attenuation_image > attenuation_cutoff).to(pytomography.dtype).to(pytomography.device),
+        object_origin,
+        dr,
+    )
+    tail_mask = object_projection == 0
+    if not tail_mask.any():
+        print("[WARNING] No sparse sinogram LORs lie outside the attenuation map: convergence is monitored over all LORs")
+        tail_mask = torch.ones_like(tail_mask)
+    return tail_mask
+
+class _TailConvergenceMonitor:
+    """Helper class to the SSS kernels: when ``convergence_tolerance`` is provided, scatter points are processed in a shuffled order (in batches of at most 5% of the points) and the relative change (L2 norm) of the sparse sinogram in its tails (see ``get_tail_pair_mask``) is monitored between consecutive batches. Otherwise, all scatter points are processed in order.
+
+    Args:
+        convergence_tolerance (float | None): Relative change below which (twice in a row) the accumulation stops. If None, convergence is not monitored.
+        detector_positions (torch.Tensor): Spatial positions of the detectors (shape :math:`(N_{detectors}, 3)`)
+        detector_idx_pairs (torch.Tensor): Detector index pairs of each LOR into ``detector_positions``
+        attenuation_image (torch.Tensor): Attenuation map used in scatter simulation
+        attenuation_cutoff (float): Attenuation values above this threshold are considered part of the object
+        object_origin (np.ndarray): Spatial coordinate of the first voxel of the attenuation map
+        dr (Sequence[float]): Voxel size of the attenuation map
+    """
+    def __init__(
+        self,
+        convergence_tolerance: float | None,
+        detector_positions: torch.Tensor,
+        detector_idx_pairs: torch.Tensor,
+        attenuation_image: torch.Tensor,
+        attenuation_cutoff: float,
+        object_origin: np.ndarray,
+        dr: Sequence[float]
+        ) -> None:
+        self.convergence_tolerance = convergence_tolerance
+        if convergence_tolerance is not None:
+            self.tail_mask = get_tail_pair_mask(detector_positions, detector_idx_pairs.to(pytomography.device), attenuation_image, attenuation_cutoff, object_origin, dr)
+        self.estimate_previous = None
+        self.num_converged = 0
+
+    def get_scatter_point_order(self, num_points: int, batch_size: int, generator: torch.Generator | None) -> Sequence[torch.Tensor, int]:
+        """Obtains the order in which scatter points are processed and the number of scatter points per batch
+
+        Args:
+            num_points (int): Number of scatter points
+            batch_size (int): Number of scatter points per batch allowed by the memory budget
+            generator (torch.Generator | None): Random number generator used for shuffling
+
+        Returns:
+            Sequence[torch.Tensor, int]: Scatter point order and batch size
+        """
+        if self.convergence_tolerance is None:
+            return torch.arange(num_points), batch_size
+        return torch.randperm(num_points, generator=generator), min(batch_size, int(np.ceil(num_points / 20)))
+
+    def __call__(self, probability: torch.Tensor, counts: int) -> bool:
+        """Updates the tail estimate after a batch of scatter points
+
+        Args:
+            probability (torch.Tensor): Sparse sinogram accumulated over all processed scatter points (last dimension LOR pairs)
+            counts (int): Number of processed scatter points
+
+        Returns:
+            bool: Whether or not the accumulation has converged
+        """
+        if self.convergence_tolerance is None:
+            return False
+        estimate = probability[...,self.tail_mask] / counts
+        estimate_norm = estimate.norm().item()
+        # The relative change is undefined until the tails receive scatter: not converged
+        if self.estimate_previous is not None and estimate_norm > 0:
+            relative_change = (estimate - self.estimate_previous).norm().item() / estimate_norm
+            self.num_converged = self.num_converged + 1 if relative_change < self.convergence_tolerance else 0
+        else:
+            self.num_converged = 0
+        self.estimate_previous = estimate
+        return self.num_converged >= 2
+
+    def report(self, counts: int, num_points: int) -> None:
+        """Prints the number of scatter points used (if convergence is monitored)
+
+        Args:
+            counts (int): Number of processed scatter points
+            num_points (int): Number of scatter points
+        """
+        if self.convergence_tolerance is not None:
+            print(f"[SSS] Used {counts} of {num_points} scatter points (convergence tolerance {self.convergence_tolerance})")
+
 def compute_sss_sparse_sinogram(
     object_meta: ObjectMeta,
     proj_meta: ProjMeta,
@@ -144,7 +858,19 @@ def compute_sss_sparse_sinogram(
     image_stepsize: int = 4,
     attenuation_cutoff: float = 0.004,
     sinogram_interring_stepsize: int = 4,
-    sinogram_intraring_stepsize: int = 4
+    sinogram_intraring_stepsize: int = 4,
+    sampled_detectors_only: bool = True,
+    memory_budget_GB: float = 1,
+    seed: int | None = None,
+    cache_transmission_integrals: bool = False,
+    cache_dir: str | None = None,
+    energy_resolution: float = 0.15,
+    energy_threshhold: float = 430,
+    physics_lut_size: int = 4096,
+    importance_sampling: bool = False,
+    num_scatter_points: int | None = None,
+    pruning_tolerance: float = 0,
+    convergence_tolerance: float | None = None
     ) -> torch.Tensor:
     """Generates a sparse single scatter simulation sinogram for non-TOF PET data. 
 
@@ -157,69 +883,88 @@ def compute_sss_sparse_sinogram(
         attenuation_cutoff (float, optional): Only consider points above this threshhold. Defaults to 0.004.
         sinogram_interring_stepsize (int, optional): Axial stepsize between rings. Defaults to 4.
         sinogram_intraring_stepsize (int, optional): Stepsize of crystals within a given ring. Defaults to 4.
+        sampled_detectors_only (bool, optional): Only compute emission/transmission integrals to the detectors sampled in the sparse sinogram (as opposed to every detector in the scanner). Defaults to True.
+        memory_budget_GB (float, optional): Approximate memory (in GB) used for evaluating batches of scatter points simultaneously. Larger values process more scatter points per batch. Defaults to 1.
+        seed (int | None, optional): Seed for the random offsets of the scatter points within their voxels. Required for the scatter points (and thus cached transmission integrals) to be reproducible between calls. Defaults to None.
+        cache_transmission_integrals (bool, optional): Whether or not to cache the scatter point to detector transmission integrals, so that subsequent calls with the same attenuation map, scatter points and detectors only recompute the emission integrals. Defaults to False.
+        cache_dir (str | None, optional): Directory where cached transmission integrals are also stored on disk. If None, they are only kept in memory. Defaults to None.
+        energy_resolution (float, optional): Energy resolution of the crystals (represented as a fraction of 511keV). Defaults to 0.15.
+        energy_threshhold (float, optional): Lower limit of energies detected by the crystals which are registered as events. Defaults to 430.
+        physics_lut_size (int, optional): Number of samples of the scattering angle cosine in the lookup table of the scatter physics terms (see ``ScatterPhysicsLUT``). Defaults to 4096.
+        importance_sampling (bool, optional): Whether or not to draw the scatter points with probability proportional to the attenuation coefficient times the local activity (see ``get_importance_sample_scatter_points``), as opposed to using every ``image_stepsize``-th voxel. In this case, ``image_stepsize`` is the block size of the coarse activity image. Defaults to False.
+        num_scatter_points (int | None, optional): Number of scatter points drawn when ``importance_sampling`` is True. If None, the number of points obtained with ``image_stepsize`` is used. Defaults to None.
+        pruning_tolerance (float, optional): Scatter points with an estimated contribution below this fraction of the mean contribution are pruned (see ``prune_scatter_points``). The contribution is estimated from the emission and transmission integrals before the (more expensive) evaluation over all LOR pairs. If 0, no pruning is performed. Defaults to 0.
+        convergence_tolerance (float | None, optional): If provided, scatter points are processed in a shuffled order (in batches of at most 5% of the points), and the accumulation stops once the relative change (L2 norm) of the sparse sinogram in its tails (see ``get_tail_pair_mask``) between consecutive batches falls below this value twice in a row. The number of scatter points used is printed. Transmission integrals are only cached if all scatter points are processed. If None, all scatter points are used. Defaults to None.
 
     Returns:
         torch.Tensor: Estimated sparse single scatter simulation sinogram.
     """
     # Important quantities
-    E_PET = torch.tensor(511).to(pytomography.device)
-    dr = torch.tensor(object_meta.dr)
-    shape = torch.tensor(object_meta.shape)
     object_origin = (- np.array(object_meta.shape) / 2 + 0.5) * (np.array(object_meta.dr))
     scanner_LUT = proj_meta.scanner_lut
-    total_compton_cross_section_511keV = total_compton_cross_section(E_PET)
-    # Get sample image/sinogram points
-    coords = get_sample_scatter_points(attenuation_image, stepsize=image_stepsize, attenuation_cutoff=attenuation_cutoff)
-    coords_position = (coords - shape.unsqueeze(1).to(pytomography.device)/2 + 0.5) * dr.unsqueeze(1).to(pytomography.device)
+    scatter_physics_lut = get_scatter_physics_lut(energy_resolution, energy_threshhold, physics_lut_size)
+    generator = None if seed is None else torch.Generator().manual_seed(seed)
+    # Get sample image/sinogram points (scatter point positions have a random offset within each voxel)
+    coords, scatter_point_weights, scatter_point_positions_all = _get_scatter_point_setup(object_meta, pet_image, attenuation_image, image_stepsize, attenuation_cutoff, importance_sampling, num_scatter_points, generator)
     _, _, detector_ids_scatter = get_sample_detector_ids(proj_meta, sinogram_interring_stepsize, sinogram_intraring_stepsize)
+    detector_positions, detector_idx_pairs = get_sample_detector_positions(scanner_LUT, detector_ids_scatter, sampled_detectors_only)
+    detector_positions = detector_positions.to(pytomography.device)
     # Begin
-    idxA, idxB = detector_ids_scatter.to(pytomography.device).T
-    rA = scanner_LUT.to(pytomography.device)[idxA]
-    rB = scanner_LUT.to(pytomography.device)[idxB]
-    # Maybe now loop over scatter points
+    idxA, idxB = detector_idx_pairs.to(pytomography.device).T
+    attenuation_image_proj = attenuation_image.to(pytomography.dtype).to(pytomography.device)
+    detector_norm_xy = torch.norm(detector_positions[:,:2], dim=1)
+    batch_size = get_scatter_point_batch_size(detector_idx_pairs.shape[0], detector_positions.shape[0], memory_budget_GB=memory_budget_GB)
+    cache_key, log_transmission_cached, log_transmission_all = None, None, None
+    if cache_transmission_integrals:
+        cache_key, log_transmission_cached, log_transmission_all = _prepare_transmission_integrals_cache(attenuation_image, object_meta, scatter_point_positions_all, detector_positions, cache_dir, seed, importance_sampling)
+    # Order in which scatter points are processed
+    converged = _TailConvergenceMonitor(convergence_tolerance, detector_positions, detector_idx_pairs, attenuation_image, attenuation_cutoff, object_origin, object_meta.dr)
+    scatter_point_order, batch_size = converged.get_scatter_point_order(coords.shape[1], batch_size, generator)
+    # Now loop over batches of scatter points
     probability = 0
     counts = 0
-    for scatter_point in range(coords.shape[1]):
-        # Get position and add random offset within the voxel
-        scatter_point_position = coords_position[:,scatter_point] + ((torch.rand(3) - 0.5) * dr).to(pytomography.device)
-        # Compute value of attenuation coefficient at scatter point
-        mu_value = attenuation_image[tuple(coords[:,scatter_point].tolist())]
-        # Compute emission/transmission integrals for that scatter point
+    prune = _ScatterPointPruner(pruning_tolerance, generator)
+    for batch_idxs in torch.split(scatter_point_order.to(pytomography.device), batch_size):
+        K = len(batch_idxs)
+        scatter_point_positions = scatter_point_positions_all[batch_idxs]
+        # Compute value of attenuation coefficient at scatter points (weighted by the sampling weight of each point)
+        mu_values = attenuation_image[tuple(coords[:,batch_idxs])].unsqueeze(1) * scatter_point_weights[batch_idxs].unsqueeze(1)
+        # Compute emission/transmission integrals for all scatter points in the batch (first dim scatter point)
+        xstart = scatter_point_positions.unsqueeze(1).expand(-1, detector_positions.shape[0], -1).flatten(end_dim=1)
+        xend = detector_positions.unsqueeze(0).expand(K, -1, -1).flatten(end_dim=1)
         emission_integrals = parallelproj.joseph3d_fwd(
-            scatter_point_position.unsqueeze(0).expand(scanner_LUT.shape[0], -1),
-            scanner_LUT.to(pytomography.device),
+            xstart,
+            xend,
             pet_image,
             object_origin,
             object_meta.dr,
-        )
-        transmission_integrals = parallelproj.joseph3d_fwd(
-            scatter_point_position.unsqueeze(0).expand(scanner_LUT.shape[0], -1),
-            scanner_LUT.to(pytomography.device),
-            attenuation_image.to(pytomography.dtype).to(pytomography.device),
-            object_origin,
-            object_meta.dr,
-        )
-        transmission_integrals_exp = torch.exp(-transmission_integrals)
-        # Compute scatter contribution
-        rSA = rA - scatter_point_position 
-        rSB = rB - scatter_point_position 
-        rSA_norm = torch.norm(rSA, dim=1) # distance between S and A
-        rSB_norm = torch.norm(rSB, dim=1) # distance between S and B
+        ).reshape((K, -1))
+        if log_transmission_cached is not None:
+            log_transmission = log_transmission_cached[batch_idxs]
+        else:
+            log_transmission = get_log_transmission_integrals(scatter_point_positions, detector_positions, attenuation_image_proj, object_origin, object_meta.dr)
+            if log_transmission_all is not None:
+                log_transmission_all[batch_idxs] = log_transmission
+        mu_values, emission_integrals, log_transmission, scatter_point_positions = prune(mu_values, emission_integrals, log_transmission, scatter_point_positions)
+        # Per-detector quantities (only depend on the scatter point and a single detector)
+        uSD, rSD_norm, cos_theta_incidence = get_scatter_point_detector_geometry(scatter_point_positions, detector_positions, detector_norm_xy)
+        detector_factor = cos_theta_incidence / rSD_norm**2
         # Compute cos(scattering_angle) = cos(pi-angle_between_vectors) = -cos(angle_between_vectors)
-        cos_theta = - (rSA*rSB).sum(axis=1) / rSA_norm / rSB_norm
-        E_new = photon_energy_after_compton_scatter_511kev(cos_theta) # 0.127 ms
-        energy_efficiency = detector_efficiency(E_new)
-        # Angle of impingement upon detectors (assumes circle, maybe fix later)
-        cos_thetaA_incidence = (rSA[:,:2]*rA[:,:2]).sum(axis=1) / rSA_norm / torch.norm(rA[:,:2], dim=1)
-        cos_thetaB_incidence = (rSB[:,:2]*rB[:,:2]).sum(axis=1) / rSB_norm / torch.norm(rB[:,:2], dim=1)
-        compton_cross_section_ratio = total_compton_cross_section(E_new) / total_compton_cross_section_511keV
-        # Start TOF Loop here, needs to consider many different offsets for each emission integral
-        # Compute probability without considering TOF information
-        probability_without_tof = 1/(rSB_norm**2 * rSA_norm**2) *\
-        (emission_integrals[idxA] * transmission_integrals_exp[idxB] ** (compton_cross_section_ratio - 1) + emission_integrals[idxB] * transmission_integrals_exp[idxA] ** (compton_cross_section_ratio - 1)) *\
-        transmission_integrals_exp[idxB] * transmission_integrals_exp[idxA] * mu_value * energy_efficiency * cos_thetaA_incidence * cos_thetaB_incidence * diff_compton_cross_section(cos_theta, E_PET) / total_compton_cross_section_511keV * np.prod(object_meta.dr)
-        probability += probability_without_tof
-        counts += 1
+        cos_theta = get_scattering_angle_cosine(uSD, idxA, idxB)
+        angular_factor, compton_cross_section_ratio = scatter_physics_lut(cos_theta)
+        # Compute probability without considering TOF information: exp(-mu_A) * exp(-mu_B)^ratio = exp(-mu_A) * exp(-mu_B) * exp(-mu_B)^(ratio-1)
+        log_transmissionA = log_transmission[:,idxA]
+        log_transmissionB = log_transmission[:,idxB]
+        probability_without_tof = (emission_integrals[:,idxA] * torch.exp(log_transmissionA + compton_cross_section_ratio * log_transmissionB) + emission_integrals[:,idxB] * torch.exp(log_transmissionB + compton_cross_section_ratio * log_transmissionA)) *\
+        detector_factor[:,idxA] * detector_factor[:,idxB] * mu_values * angular_factor * np.prod(object_meta.dr)
+        probability += probability_without_tof.sum(dim=0)
+        counts += K
+        if converged(probability, counts):
+            break
+    converged.report(counts, coords.shape[1])
+    if log_transmission_all is not None and counts == coords.shape[1]:
+        store_transmission_integrals(cache_key, log_transmission_all, cache_dir)
+    prune.report()
     scatter_sinogram_sparse = shared.listmode_to_sinogram(detector_ids_scatter, proj_meta.info, weights=(probability/counts).cpu())
     return scatter_sinogram_sparse
 
@@ -234,8 +979,20 @@ def compute_sss_sparse_sinogram_TOF(
     sinogram_interring_stepsize: int = 4,
     sinogram_intraring_stepsize: int = 4,
     num_dense_tof_bins: int = 25,
-    N_splits: int = 1
-    )->torch.Tensor:
+    N_splits: int = 1,
+    sampled_detectors_only: bool = True,
+    memory_budget_GB: float = 1,
+    seed: int | None = None,
+    cache_transmission_integrals: bool = False,
+    cache_dir: str | None = None,
+    energy_resolution: float = 0.15,
+    energy_threshhold: float = 430,
+    physics_lut_size: int = 4096,
+    importance_sampling: bool = False,
+    num_scatter_points: int | None = None,
+    pruning_tolerance: float = 0,
+    convergence_tolerance: float | None = None
+    ) -> torch.Tensor:
     """Generates a sparse single scatter simulation sinogram for TOF PET data. 
 
     Args:
@@ -250,81 +1007,105 @@ def compute_sss_sparse_sinogram_TOF(
         sinogram_interring_stepsize (int, optional): Axial stepsize between rings. Defaults to 4.
         sinogram_intraring_stepsize (int, optional): Stepsize of crystals within a given ring. Defaults to 4.
         num_dense_tof_bins (int, optional): Number of dense TOF bins used when partioning the emission integrals (these integrals must be partioned for TOF-based estimation). Defaults to 25.
+        N_splits (int, optional): Splits the TOF bins into subsets and loops over them sequentially (as opposed to parallel). Since the number of scatter points per batch is chosen from ``memory_budget_GB``, this is generally not required. Defaults to 1.
+        sampled_detectors_only (bool, optional): Only compute emission/transmission integrals to the detectors sampled in the sparse sinogram (as opposed to every detector in the scanner). Defaults to True.
+        memory_budget_GB (float, optional): Approximate memory (in GB) used for evaluating batches of scatter points simultaneously. Larger values process more scatter points per batch. Defaults to 1.
+        seed (int | None, optional): Seed for the random offsets of the scatter points within their voxels. Required for the scatter points (and thus cached transmission integrals) to be reproducible between calls. Defaults to None.
+        cache_transmission_integrals (bool, optional): Whether or not to cache the scatter point to detector transmission integrals, so that subsequent calls with the same attenuation map, scatter points and detectors only recompute the emission integrals. Defaults to False.
+        cache_dir (str | None, optional): Directory where cached transmission integrals are also stored on disk. If None, they are only kept in memory. Defaults to None.
+        energy_resolution (float, optional): Energy resolution of the crystals (represented as a fraction of 511keV). Defaults to 0.15.
+        energy_threshhold (float, optional): Lower limit of energies detected by the crystals which are registered as events. Defaults to 430.
+        physics_lut_size (int, optional): Number of samples of the scattering angle cosine in the lookup table of the scatter physics terms (see ``ScatterPhysicsLUT``). Defaults to 4096.
+        importance_sampling (bool, optional): Whether or not to draw the scatter points with probability proportional to the attenuation coefficient times the local activity (see ``get_importance_sample_scatter_points``), as opposed to using every ``image_stepsize``-th voxel. In this case, ``image_stepsize`` is the block size of the coarse activity image. Defaults to False.
+        num_scatter_points (int | None, optional): Number of scatter points drawn when ``importance_sampling`` is True. If None, the number of points obtained with ``image_stepsize`` is used. Defaults to None.
+        pruning_tolerance (float, optional): Scatter points with an estimated contribution below this fraction of the mean contribution are pruned (see ``prune_scatter_points``). The contribution is estimated from the emission and transmission integrals before the (more expensive) evaluation over all LOR pairs. If 0, no pruning is performed. Defaults to 0.
+        convergence_tolerance (float | None, optional): If provided, scatter points are processed in a shuffled order (in batches of at most 5% of the points), and the accumulation stops once the relative change (L2 norm) of the sparse sinogram in its tails (see ``get_tail_pair_mask``) between consecutive batches falls below this value twice in a row. The number of scatter points used is printed. Transmission integrals are only cached if all scatter points are processed. If None, all scatter points are used. Defaults to None.
 
     Returns:
         torch.Tensor: Estimated sparse single scatter simulation sinogram.
     """
     # Important quantities
-    E_PET = torch.tensor(511).to(pytomography.device)
-    dr = torch.tensor(object_meta.dr)
-    shape = torch.tensor(object_meta.shape)
     object_origin = (- np.array(object_meta.shape) / 2 + 0.5) * (np.array(object_meta.dr))
     scanner_LUT = proj_meta.scanner_lut
-    total_compton_cross_section_511keV = total_compton_cross_section(E_PET)
-    # Get sample image/sinogram points
-    coords = get_sample_scatter_points(attenuation_image, stepsize=image_stepsize, attenuation_cutoff=attenuation_cutoff)
-    coords_position = (coords - shape.unsqueeze(1).to(pytomography.device)/2 + 0.5) * dr.unsqueeze(1).to(pytomography.device)
+    scatter_physics_lut = get_scatter_physics_lut(energy_resolution, energy_threshhold, physics_lut_size)
+    generator = None if seed is None else torch.Generator().manual_seed(seed)
+    # Get sample image/sinogram points (scatter point positions have a random offset within each voxel)
+    coords, scatter_point_weights, scatter_point_positions_all = _get_scatter_point_setup(object_meta, pet_image, attenuation_image, image_stepsize, attenuation_cutoff, importance_sampling, num_scatter_points, generator)
     _, _, detector_ids_scatter = get_sample_detector_ids(proj_meta, sinogram_interring_stepsize, sinogram_intraring_stepsize)
+    detector_positions, detector_idx_pairs = get_sample_detector_positions(scanner_LUT, detector_ids_scatter, sampled_detectors_only)
+    detector_positions = detector_positions.to(pytomography.device)
     # Begin
-    idxA, idxB = detector_ids_scatter.to(pytomography.device).T
-    rA = scanner_LUT.to(pytomography.device)[idxA]
-    rB = scanner_LUT.to(pytomography.device)[idxB]
-    # Now loop over scatter points
-    probability = torch.zeros([tof_meta.num_bins, detector_ids_scatter.shape[0]]).to(pytomography.device)
+    idxA, idxB = detector_idx_pairs.to(pytomography.device).T
+    attenuation_image_proj = attenuation_image.to(pytomography.dtype).to(pytomography.device)
+    detector_norm_xy = torch.norm(detector_positions[:,:2], dim=1)
+    bin_edges_scaling = torch.linspace(0,1,num_dense_tof_bins+1).to(pytomography.device)
     tof_bin_idxs = torch.arange(tof_meta.num_bins)
     tof_bin_positions = tof_meta.bin_positions.to(pytomography.device)
+    batch_size = get_scatter_point_batch_size(detector_idx_pairs.shape[0], detector_positions.shape[0], int(np.ceil(tof_meta.num_bins / N_splits)), num_dense_tof_bins, memory_budget_GB)
+    cache_key, log_transmission_cached, log_transmission_all = None, None, None
+    if cache_transmission_integrals:
+        cache_key, log_transmission_cached, log_transmission_all = _prepare_transmission_integrals_cache(attenuation_image, object_meta, scatter_point_positions_all, detector_positions, cache_dir, seed, importance_sampling)
+    # Order in which scatter points are processed
+    converged = _TailConvergenceMonitor(convergence_tolerance, detector_positions, detector_idx_pairs, attenuation_image, attenuation_cutoff, object_origin, object_meta.dr)
+    scatter_point_order, batch_size = converged.get_scatter_point_order(coords.shape[1], batch_size, generator)
+    # Now loop over batches of scatter points
+    probability = torch.zeros([tof_meta.num_bins, detector_ids_scatter.shape[0]]).to(pytomography.device)
     counts = 0
-    for scatter_point in range(coords.shape[1]):
-        scatter_point_position = coords_position[:,scatter_point] + ((torch.rand(3) - 0.5) * dr).to(pytomography.device)
-        # Compute value of attenuation coefficient at scatter point
-        mu_value = attenuation_image[tuple(coords[:,scatter_point].tolist())]
-        # Compute emission/transmission integrals for that scatter point
-        rSD = scanner_LUT.to(pytomography.device) - scatter_point_position
-        rSD_norm = torch.norm(rSD, dim=1)
-        bin_edges_scaling = torch.linspace(0,1,num_dense_tof_bins+1).to(pytomography.device)
-        bin_edges_distance_along_LOR = bin_edges_scaling.reshape((1,-1)) * rSD_norm.reshape((-1,1))
-        bin_centers_distance_along_LOR = (bin_edges_distance_along_LOR[:,1:] + bin_edges_distance_along_LOR[:,:-1]) / 2
-        bin_edges = scatter_point_position.reshape((1,1,-1)) + bin_edges_distance_along_LOR.unsqueeze(-1) * (rSD/rSD_norm.unsqueeze(-1)).unsqueeze(1)
+    prune = _ScatterPointPruner(pruning_tolerance, generator)
+    for batch_idxs in torch.split(scatter_point_order.to(pytomography.device), batch_size):
+        K = len(batch_idxs)
+        scatter_point_positions = scatter_point_positions_all[batch_idxs]
+        # Compute value of attenuation coefficient at scatter points (weighted by the sampling weight of each point)
+        mu_values = attenuation_image[tuple(coords[:,batch_idxs])].unsqueeze(1) * scatter_point_weights[batch_idxs].unsqueeze(1)
+        # Compute emission/transmission integrals for all scatter points in the batch (first dim scatter point)
+        uSD, rSD_norm, cos_theta_incidence = get_scatter_point_detector_geometry(scatter_point_positions, detector_positions, detector_norm_xy)
+        bin_edges_distance_along_LOR = bin_edges_scaling * rSD_norm.unsqueeze(-1)
+        bin_edges = scatter_point_positions.reshape((K,1,1,-1)) + bin_edges_distance_along_LOR.unsqueeze(-1) * uSD.unsqueeze(2)
         # Evaluate emission integral in many distinct line segments between scatter point and detectors (used for TOF)
         emission_integrals = parallelproj.joseph3d_fwd(
-            bin_edges[:,:-1].flatten(end_dim=-2),
-            bin_edges[:,1:].flatten(end_dim=-2),
+            bin_edges[:,:,:-1].flatten(end_dim=-2),
+            bin_edges[:,:,1:].flatten(end_dim=-2),
             pet_image,
             object_origin,
             object_meta.dr,
-        ).reshape((scanner_LUT.shape[0],num_dense_tof_bins))
-        transmission_integrals = parallelproj.joseph3d_fwd(
-            scatter_point_position.unsqueeze(0).expand(scanner_LUT.shape[0], -1),
-            scanner_LUT.to(pytomography.device),
-            attenuation_image.to(pytomography.dtype).to(pytomography.device),
-            object_origin,
-            object_meta.dr,
-        )
-        transmission_integrals_exp = torch.exp(-transmission_integrals)
-        rSA = rA - scatter_point_position 
-        rSB = rB - scatter_point_position 
-        rSA_norm = torch.norm(rSA, dim=1) # distance between S and A
-        rSB_norm = torch.norm(rSB, dim=1) # distance between S and B
-        offset_SA = - ((rSB_norm-rSA_norm).unsqueeze(0)/2 + tof_bin_positions.unsqueeze(1)) # first dim TOFbin
+        ).reshape((K,detector_positions.shape[0],num_dense_tof_bins))
+        if log_transmission_cached is not None:
+            log_transmission = log_transmission_cached[batch_idxs]
+        else:
+            log_transmission = get_log_transmission_integrals(scatter_point_positions, detector_positions, attenuation_image_proj, object_origin, object_meta.dr)
+            if log_transmission_all is not None:
+                log_transmission_all[batch_idxs] = log_transmission
+        mu_values, emission_integrals, log_transmission, uSD, rSD_norm, cos_theta_incidence = prune(mu_values, emission_integrals, log_transmission, uSD, rSD_norm, cos_theta_incidence)
+        # Per-detector quantities (only depend on the scatter point and a single detector)
+        detector_factor = cos_theta_incidence / rSD_norm**2
+        offset_SA = - ((rSD_norm[:,idxB]-rSD_norm[:,idxA]).unsqueeze(0)/2 + tof_bin_positions.reshape((-1,1,1))) # first dim TOFbin
         offset_SB = -offset_SA
+        cos_theta = get_scattering_angle_cosine(uSD, idxA, idxB)
+        angular_factor, compton_cross_section_ratio = scatter_physics_lut(cos_theta)
+        # Terms shared by all TOF bins
+        log_transmissionA = log_transmission[:,idxA]
+        log_transmissionB = log_transmission[:,idxB]
+        scatter_factor = detector_factor[:,idxA] * detector_factor[:,idxB] * mu_values * angular_factor * np.prod(object_meta.dr)
+        attenuation_factorA = torch.exp(log_transmissionB + compton_cross_section_ratio * log_transmissionA)
+        attenuation_factorB = torch.exp(log_transmissionA + compton_cross_section_ratio * log_transmissionB)
+        # Dense segments between the scatter point and each detector of the pairs
+        segment_lengthA = rSD_norm[:,idxA] / num_dense_tof_bins
+        segment_lengthB = rSD_norm[:,idxB] / num_dense_tof_bins
+        emission_integralsA_dense = emission_integrals[:,idxA]
+        emission_integralsB_dense = emission_integrals[:,idxB]
         # Loop over split TOF bins
         for tof_bin_idxs_partial in torch.tensor_split(tof_bin_idxs, N_splits):
-            prob_SA = tof_efficiency(offset_SA[tof_bin_idxs_partial], bin_centers_distance_along_LOR[idxA], tof_meta) # first dim TOFbin
-            prob_SB = tof_efficiency(offset_SB[tof_bin_idxs_partial], bin_centers_distance_along_LOR[idxB], tof_meta) # first dim TOFbin
-            # Compute emission integrals
-            emission_integralsA = (prob_SA*emission_integrals[idxA].unsqueeze(0)).sum(dim=-1)
-            emission_integralsB = (prob_SB*emission_integrals[idxB].unsqueeze(0)).sum(dim=-1)
-            cos_theta = - (rSA*rSB).sum(axis=1) / rSA_norm / rSB_norm
-            E_new = photon_energy_after_compton_scatter_511kev(cos_theta) 
-            energy_efficiency = detector_efficiency(E_new)
-            # Angle of impingement upon detectors (assumes circle, maybe fix later)
-            cos_thetaA_incidence = (rSA[:,:2]*rA[:,:2]).sum(axis=1) / rSA_norm / torch.norm(rA[:,:2], dim=1)
-            cos_thetaB_incidence = (rSB[:,:2]*rB[:,:2]).sum(axis=1) / rSB_norm / torch.norm(rB[:,:2], dim=1)
-            compton_cross_section_ratio = total_compton_cross_section(E_new) / total_compton_cross_section_511keV
-            probability[tof_bin_idxs_partial] += 1/(rSB_norm**2 * rSA_norm**2) *\
-            (emission_integralsA * transmission_integrals_exp[idxB] ** (compton_cross_section_ratio - 1) + emission_integralsB * transmission_integrals_exp[idxA] ** (compton_cross_section_ratio - 1)) *\
-            transmission_integrals_exp[idxB] * transmission_integrals_exp[idxA] * mu_value * energy_efficiency * cos_thetaA_incidence * cos_thetaB_incidence * diff_compton_cross_section(cos_theta, E_PET) / total_compton_cross_section_511keV * np.prod(object_meta.dr)
-        counts+=1
+            # Compute emission integrals in each TOF bin (first dim TOFbin)
+            emission_integralsA = get_tof_emission_integrals(emission_integralsA_dense, segment_lengthA, offset_SA[tof_bin_idxs_partial], tof_meta)
+            emission_integralsB = get_tof_emission_integrals(emission_integralsB_dense, segment_lengthB, offset_SB[tof_bin_idxs_partial], tof_meta)
+            probability[tof_bin_idxs_partial] += ((emission_integralsA * attenuation_factorB + emission_integralsB * attenuation_factorA) * scatter_factor).sum(dim=1)
+        counts += K
+        if converged(probability, counts):
+            break
+    converged.report(counts, coords.shape[1])
+    if log_transmission_all is not None and counts == coords.shape[1]:
+        store_transmission_integrals(cache_key, log_transmission_all, cache_dir)
+    prune.report()
     probability = probability.ravel()
     # Get TOF bins
     TOF_bins = torch.cartesian_prod(torch.arange(tof_meta.num_bins), detector_ids_scatter[:,0])[:,0]
@@ -333,60 +1114,171 @@ def compute_sss_sparse_sinogram_TOF(
     scatter_sinogram_sparse = shared.listmode_to_sinogram(detector_ids_scatter_with_TOF, proj_meta.info, tof_meta=tof_meta, weights=(probability/counts).cpu())
     return scatter_sinogram_sparse
 
-def interpolate_sparse_sinogram(
-    scatter_sinogram_sparse: torch.Tensor,
+def interpolate_along_first_dim(
+    values: torch.Tensor,
+    mask: torch.Tensor
+    ) -> torch.Tensor:
+    """Linearly interpolates ``values`` along the first dimension between the entries where ``mask`` is True. Entries before the first (or after the last) sampled entry are linearly extrapolated from the first (or last) two sampled entries (slices with a single sampled entry are constant). Runs in linear time with respect to the size of ``values``.
+
+    Args:
+        values (torch.Tensor): Values to interpolate; only the entries where ``mask`` is True are used.
+        mask (torch.Tensor): Boolean tensor (broadcastable to ``values``) specifying the sampled entries.
+
+    Returns:
+        torch.Tensor: Interpolated values. Slices without any sampled entries are set to zero.
+    """
+    L = values.shape[0]
+    position = torch.arange(L, device=values.device).reshape((-1,*[1]*(mask.dim()-1))).expand(mask.shape)
+    idx_prev = torch.where(mask, position, -1).cummax(dim=0).values
+    idx_next = torch.where(mask, position, L).flip(0).cummin(dim=0).values.flip(0)
+    # First/second and second to last/last sampled entries of each slice, used for linear extrapolation at the edges
+    idx_first = idx_next[:1]
+    idx_second = idx_next.gather(0, (idx_first + 1).clamp(max=L-1))
+    idx_second = torch.where((idx_first + 1 < L) * (idx_second < L), idx_second, idx_first)
+    idx_last = idx_prev[-1:]
+    idx_second_last = idx_prev.gather(0, (idx_last - 1).clamp(min=0))
+    idx_second_last = torch.where((idx_last - 1 >= 0) * (idx_second_last >= 0), idx_second_last, idx_last)
+    idx_prev_valid = torch.where(idx_prev<0, idx_first, torch.where(idx_next>=L, idx_second_last, idx_prev))
+    idx_next_valid = torch.where(idx_prev<0, idx_second, torch.where(idx_next>=L, idx_last, idx_next))
+    has_samples = (idx_prev_valid>=0) * (idx_prev_valid<L)
+    idx_prev_valid = idx_prev_valid.clamp(0, L-1)
+    idx_next_valid = idx_next_valid.clamp(0, L-1)
+    weight = torch.where(idx_next_valid>idx_prev_valid, (position - idx_prev_valid) / (idx_next_valid - idx_prev_valid).clamp(min=1), 0).to(values.dtype)
+    values_prev = values.gather(0, idx_prev_valid.expand(values.shape))
+    values_next = values.gather(0, idx_next_valid.expand(values.shape))
+    return ((1-weight) * values_prev + weight * values_next) * has_samples
+
+def interpolate_sparse_sinogram_grid(
+    scatter_sinogram_sparse_planes: torch.Tensor,
+    angular_radial_idx_sparse: torch.Tensor
+    ) -> torch.Tensor:
+    """Interpolates a sparse sinogram in the angular/radial dimensions using seperable linear interpolation. The sparse samples (from evenly spaced crystals) lie on a regular staggered lattice: each sampled angular row contains evenly spaced radial samples. The sinogram is first interpolated along the radial direction in each sampled angular row, and then along the angular direction between sampled rows. The angular direction is periodic: the row following the last angular row is the first row with the radial coordinate flipped. Radial values beyond the outermost samples are linearly extrapolated (and clamped to be non-negative).
+
+    Args:
+        scatter_sinogram_sparse_planes (torch.Tensor): Sparse sinogram of shape :math:`(N_{\theta}, N_r, ...)`, where trailing dimensions (e.g. oblique planes) are interpolated independently.
+        angular_radial_idx_sparse (torch.Tensor): Angular/radial indices (shape :math:`(N_{samples}, 2)`) of the sampled locations in the sinogram.
+
+    Returns:
+        torch.Tensor: Sinogram interpolated at all angular/radial locations
+    """
+    mask = torch.zeros(scatter_sinogram_sparse_planes.shape[:2], dtype=torch.bool, device=scatter_sinogram_sparse_planes.device)
+    mask[angular_radial_idx_sparse[:,0], angular_radial_idx_sparse[:,1]] = True
+    mask = mask.reshape((*mask.shape, *[1]*(scatter_sinogram_sparse_planes.dim()-2)))
+    # Interpolate radially within each angular row containing samples
+    sinogram_interp = interpolate_along_first_dim(scatter_sinogram_sparse_planes.swapaxes(0,1), mask.swapaxes(0,1)).swapaxes(0,1)
+    # Interpolate angularly between rows containing samples. Rows beyond the last sampled row wrap around to the first sampled row (radially flipped), and vice versa
+    row_mask = mask.any(dim=1, keepdim=True)
+    sampled_rows = torch.nonzero(row_mask.reshape(row_mask.shape[0], -1).any(dim=1)).ravel()
+    if len(sampled_rows) == 0:
+        return torch.zeros_like(sinogram_interp)
+    first, last = sampled_rows[0].item(), sampled_rows[-1].item()
+    sinogram_interp_wrapped = torch.concatenate([sinogram_interp[last:].flip(1), sinogram_interp, sinogram_interp[:first+1].flip(1)])
+    row_mask_wrapped = torch.concatenate([row_mask[last:], row_mask, row_mask[:first+1]])
+    start = sinogram_interp.shape[0] - last
+    sinogram_interp = interpolate_along_first_dim(sinogram_interp_wrapped, row_mask_wrapped)[start:start+sinogram_interp.shape[0]]
+    # Radial extrapolation beyond the outermost samples may overshoot below zero
+    return sinogram_interp.clamp(min=0)
+
+def get_sparse_sinogram_interpolation_geometry(
     proj_meta: ProjMeta,
     idx_intraring: torch.Tensor,
     idx_ring: torch.Tensor
-    ) -> torch.Tensor:
-    """Interpolates a sparse SSS sinogram estimate using linear interpolation on all oblique planes.
+    ) -> dict:
+    """Computes all geometry tables required for interpolating a sparse SSS sinogram. These only depend on the scanner geometry and on the sampled detectors, and so they can be computed once and reused for all TOF bins (and all subsequent scatter estimates).
 
     Args:
-        scatter_sinogram_sparse (torch.Tensor): Estimated sparse SSS sinogram from the ``compute_sss_sparse_sinogram`` or ``compute_sss_sparse_sinogram_TOF`` functions
         proj_meta (ProjMeta): PET projection metadata corresponding to the sinogram
         idx_intraring (torch.Tensor): Intraring indices corresponding to non-zero locations of the sinogram (obtained via the ``get_sample_detector_ids`` function)
         idx_ring (torch.Tensor): Interring indices corresponding to non-zero locations of the sinogram (obtained via the ``get_sample_detector_ids`` function)
 
     Returns:
-        torch.Tensor: Interpolated SSS sinogram
+        dict: Angular/radial indices of all LORs and of the sampled LORs, sinogram plane indices of the sampled ring pairs, the axial interpolation mesh, and the ring indices used to reorder the (z1,z2) planes into the sinogram plane order.
     """
     lor_coordinates, sinogram_index = sinogram_coordinates(proj_meta.info)
     _, ring_coordinates = sinogram_to_spatial(proj_meta.info)
-    # First interpolate r/theta in all seperate oblique planes
     intra_crystal_index_pairs_sparse = torch.combinations(torch.arange(proj_meta.info['NrCrystalsPerRing']),2).T
     intra_crystal_index_pairs = torch.combinations(idx_intraring,2).T
     inter_crystal_index_pairs = torch.cartesian_prod(idx_ring, idx_ring).T
-    angular_radial_idx = lor_coordinates[intra_crystal_index_pairs_sparse[0], intra_crystal_index_pairs_sparse[1]]
-    angular_radial_idx_sparse = lor_coordinates[intra_crystal_index_pairs[0], intra_crystal_index_pairs[1]]
-    sinogram_plane_idx_sparse = sinogram_index[inter_crystal_index_pairs[0], inter_crystal_index_pairs[1]]
-    interpolator = RBFInterpolator(
-        angular_radial_idx_sparse.to(torch.float32).to(pytomography.device),
-        scatter_sinogram_sparse[angular_radial_idx_sparse.T[0], angular_radial_idx_sparse.T[1]][:,sinogram_plane_idx_sparse].to(pytomography.device),
-        kernel='linear',
-        device=pytomography.device
-    )
-    interp_vals = interpolator(angular_radial_idx.to(torch.float32).to(pytomography.device))
-    scatter_sinogram_interp_rtheta = torch.zeros(*scatter_sinogram_sparse.shape[:2], sinogram_plane_idx_sparse.shape[0]).to(pytomography.device)
-    scatter_sinogram_interp_rtheta[angular_radial_idx.T[0], angular_radial_idx.T[1]] = interp_vals
-    scatter_sinogram_interp_rtheta = scatter_sinogram_interp_rtheta.reshape(scatter_sinogram_interp_rtheta.shape[0], scatter_sinogram_interp_rtheta.shape[1], len(idx_ring), len(idx_ring))
-    # Now interpolate Z using grid_sample
-    z1_sparse = z2_sparse = ring_coordinates[idx_ring][:,0].cpu().numpy().astype(np.float32)
-    z1 = z2 = ring_coordinates[np.arange(proj_meta.info['NrRings'])][:,0].cpu().numpy().astype(np.float32)
+    # Axial interpolation mesh used in grid_sample
+    z1_sparse = ring_coordinates[idx_ring][:,0].cpu().numpy().astype(np.float32)
+    z1 = ring_coordinates[np.arange(proj_meta.info['NrRings'])][:,0].cpu().numpy().astype(np.float32)
     idx = torch.searchsorted(torch.tensor(-z1_sparse), torch.tensor(-z1[1:-1]), side='right') - 1
     idx += -(z1_sparse[idx] - z1[1:-1]) / (z1_sparse[idx+1] - z1_sparse[idx])
     idx = torch.concatenate([torch.tensor([0]), idx, torch.tensor([z1_sparse.shape[0]-1])])
     idx = 2/idx.max() * idx  - 1
     interp_mesh = np.stack(np.meshgrid(idx,idx, indexing='ij'), axis=-1)
-    interp_mesh = torch.tensor(interp_mesh).to(torch.float32).to(pytomography.device)
-    # r/theta becomes batch/channel in grid_sample, which is fine
+    idx_sort = torch.argsort(sinogram_index.ravel())
+    return {
+        'angular_radial_idx': lor_coordinates[intra_crystal_index_pairs_sparse[0], intra_crystal_index_pairs_sparse[1]],
+        'angular_radial_idx_sparse': lor_coordinates[intra_crystal_index_pairs[0], intra_crystal_index_pairs[1]],
+        'sinogram_plane_idx_sparse': sinogram_index[inter_crystal_index_pairs[0], inter_crystal_index_pairs[1]],
+        'interp_mesh': torch.tensor(interp_mesh).to(torch.float32),
+        'idx_ring1': idx_sort % sinogram_index.shape[-1],
+        'idx_ring2': idx_sort // sinogram_index.shape[-1],
+    }
+
+def interpolate_sparse_sinogram(
+    scatter_sinogram_sparse: torch.Tensor,
+    proj_meta: ProjMeta,
+    idx_intraring: torch.Tensor,
+    idx_ring: torch.Tensor,
+    interpolation_method: str = 'rbf',
+    interpolation_geometry: dict | None = None
+    ) -> torch.Tensor:
+    """Interpolates a sparse SSS sinogram estimate using linear interpolation on all oblique planes. For TOF sinograms, all TOF bins are interpolated in a single pass (the TOF dimension is treated as a batch dimension).
+
+    Args:
+        scatter_sinogram_sparse (torch.Tensor): Estimated sparse SSS sinogram from the ``compute_sss_sparse_sinogram`` or ``compute_sss_sparse_sinogram_TOF`` functions
+        proj_meta (ProjMeta): PET projection metadata corresponding to the sinogram
+        idx_intraring (torch.Tensor): Intraring indices corresponding to non-zero locations of the sinogram (obtained via the ``get_sample_detector_ids`` function)
+        idx_ring (torch.Tensor): Interring indices corresponding to non-zero locations of the sinogram (obtained via the ``get_sample_detector_ids`` function)
+        interpolation_method (str, optional): Method used for interpolating the angular/radial dimensions of each oblique plane. Either ``'rbf'`` (linear radial basis function interpolation over all samples) or ``'grid'`` (seperable linear interpolation on the regular sampling grid, which scales linearly with the number of samples). Defaults to 'rbf'.
+        interpolation_geometry (dict | None, optional): Precomputed output of ``get_sparse_sinogram_interpolation_geometry``. If None, it is computed. Defaults to None.
+
+    Returns:
+        torch.Tensor: Interpolated SSS sinogram
+    """
+    if interpolation_geometry is None:
+        interpolation_geometry = get_sparse_sinogram_interpolation_geometry(proj_meta, idx_intraring, idx_ring)
+    angular_radial_idx = interpolation_geometry['angular_radial_idx']
+    angular_radial_idx_sparse = interpolation_geometry['angular_radial_idx_sparse']
+    sinogram_plane_idx_sparse = interpolation_geometry['sinogram_plane_idx_sparse']
+    # Trailing dimension is TOF (of size 1 for non-TOF data)
+    TOF = len(scatter_sinogram_sparse.shape)>3
+    if not TOF:
+        scatter_sinogram_sparse = scatter_sinogram_sparse.unsqueeze(-1)
+    num_tof_bins = scatter_sinogram_sparse.shape[-1]
+    # First interpolate r/theta in all seperate oblique planes
+    if interpolation_method == 'rbf':
+        interpolator = RBFInterpolator(
+            angular_radial_idx_sparse.to(torch.float32).to(pytomography.device),
+            scatter_sinogram_sparse[angular_radial_idx_sparse.T[0], angular_radial_idx_sparse.T[1]][:,sinogram_plane_idx_sparse].flatten(start_dim=1).to(pytomography.device),
+            kernel='linear',
+            device=pytomography.device
+        )
+        interp_vals = interpolator(angular_radial_idx.to(torch.float32).to(pytomography.device)).reshape((-1, sinogram_plane_idx_sparse.shape[0], num_tof_bins))
+    elif interpolation_method == 'grid':
+        scatter_sinogram_interp_grid = interpolate_sparse_sinogram_grid(
+            scatter_sinogram_sparse[:,:,sinogram_plane_idx_sparse].to(pytomography.device),
+            angular_radial_idx_sparse.to(pytomography.device)
+        )
+        interp_vals = scatter_sinogram_interp_grid[angular_radial_idx.T[0], angular_radial_idx.T[1]]
+    else:
+        raise ValueError(f"Unknown interpolation_method '{interpolation_method}': must be 'rbf' or 'grid'")
+    scatter_sinogram_interp_rtheta = torch.zeros(*scatter_sinogram_sparse.shape[:2], sinogram_plane_idx_sparse.shape[0], num_tof_bins).to(pytomography.device)
+    scatter_sinogram_interp_rtheta[angular_radial_idx.T[0], angular_radial_idx.T[1]] = interp_vals
+    scatter_sinogram_interp_rtheta = scatter_sinogram_interp_rtheta.reshape(scatter_sinogram_interp_rtheta.shape[0], scatter_sinogram_interp_rtheta.shape[1], len(idx_ring), len(idx_ring), num_tof_bins)
+    # Now interpolate Z using grid_sample
+    interp_mesh = interpolation_geometry['interp_mesh'].to(pytomography.device)
+    # r/theta/TOF becomes batch/channel in grid_sample, which is fine
     scatter_sinogram_interp_all = grid_sample(
-        scatter_sinogram_interp_rtheta.flatten(start_dim=0, end_dim=1).unsqueeze(0),
+        scatter_sinogram_interp_rtheta.permute((0,1,4,2,3)).flatten(start_dim=0, end_dim=2).unsqueeze(0),
         interp_mesh.unsqueeze(0),
         align_corners=True
-    ).reshape((*scatter_sinogram_interp_rtheta.shape[:2], len(z1), len(z2))).cpu()
-    idx_ring1 = torch.argsort(sinogram_index.ravel()) % sinogram_index.shape[-1]
-    idx_ring2 = torch.argsort(sinogram_index.ravel()) // sinogram_index.shape[-1]
-    scatter_sinogram_interp_all = scatter_sinogram_interp_all[:,:,idx_ring1,idx_ring2]
+    ).reshape((*scatter_sinogram_interp_rtheta.shape[:2], num_tof_bins, *interp_mesh.shape[:2])).permute((0,1,3,4,2)).cpu()
+    scatter_sinogram_interp_all = scatter_sinogram_interp_all[:,:,interpolation_geometry['idx_ring1'],interpolation_geometry['idx_ring2']]
+    if not TOF:
+        scatter_sinogram_interp_all = scatter_sinogram_interp_all.squeeze(-1)
     return scatter_sinogram_interp_all
 
 # CHANGED THIS FUNCTION FOR PET VEREOS SCANNER
@@ -489,7 +1381,20 @@ def get_sss_scatter_estimate(
     sinogram_random: torch.Tensor | None = None,
     tof_meta: PETTOFMeta = None,
     num_dense_tof_bins: int = 25,
-    N_splits: int = 1
+    N_splits: int = 1,
+    sampled_detectors_only: bool = True,
+    memory_budget_GB: float = 1,
+    seed: int | None = None,
+    cache_transmission_integrals: bool = False,
+    cache_dir: str | None = None,
+    interpolation_method: str = 'rbf',
+    energy_resolution: float = 0.15,
+    energy_threshhold: float = 430,
+    physics_lut_size: int = 4096,
+    importance_sampling: bool = False,
+    num_scatter_points: int | None = None,
+    pruning_tolerance: float = 0,
+    convergence_tolerance: float | None = None
 ) -> torch.Tensor:
     """Main function used to get SSS scatter estimation during PET reconstruction
 
@@ -507,7 +1412,20 @@ def get_sss_scatter_estimate(
         sinogram_random (torch.Tensor | None, optional): Estimated randoms. Defaults to None.
         tof_meta (PETTOFMeta, optional): TOFMetadata corresponding to ``proj_data`` (if TOF is considered). Defaults to None.
         num_dense_tof_bins (int, optional): Number of dense TOF bins to use for partioning emission integrals when performing a TOF estimate. This is seperate from TOF bins used in the PET data. Defaults to 25.
-        N_splits (int, optional): Splits the TOF bins into subsets and loops over them sequentially (as opposed to parallel) for scatter estimation. Defaults to 1.
+        N_splits (int, optional): Splits the TOF bins into subsets and loops over them sequentially (as opposed to parallel) for scatter estimation. Generally not required, since the number of scatter points per batch is chosen from ``memory_budget_GB``. Defaults to 1.
+        sampled_detectors_only (bool, optional): Only compute emission/transmission integrals to the detectors sampled in the sparse sinogram. Defaults to True.
+        memory_budget_GB (float, optional): Approximate memory (in GB) used for evaluating batches of scatter points simultaneously in the SSS kernels. Defaults to 1.
+        seed (int | None, optional): Seed for the random offsets of the scatter points within their voxels. Should be provided when ``cache_transmission_integrals`` is True. Defaults to None.
+        cache_transmission_integrals (bool, optional): Whether or not to reuse scatter point to detector transmission integrals between calls (the attenuation map is fixed between scatter updates). Defaults to False.
+        cache_dir (str | None, optional): Directory where cached transmission integrals are also stored on disk. Defaults to None.
+        interpolation_method (str, optional): Method used to interpolate the sparse sinogram in the angular/radial dimensions: ``'rbf'`` or ``'grid'`` (see ``interpolate_sparse_sinogram``). Defaults to 'rbf'.
+        energy_resolution (float, optional): Energy resolution of the crystals (represented as a fraction of 511keV) used in the scatter simulation. Defaults to 0.15.
+        energy_threshhold (float, optional): Lower energy threshold (in keV) of the crystals used in the scatter simulation. Defaults to 430.
+        physics_lut_size (int, optional): Number of samples in the lookup table of the scatter physics terms used in the SSS kernels. Defaults to 4096.
+        importance_sampling (bool, optional): Whether or not to draw the scatter points with probability proportional to the attenuation coefficient times the local activity in ``pet_image``, as opposed to using every ``image_stepsize``-th voxel. Defaults to False.
+        num_scatter_points (int | None, optional): Number of scatter points drawn when ``importance_sampling`` is True. If None, the number of points obtained with ``image_stepsize`` is used. Defaults to None.
+        pruning_tolerance (float, optional): Scatter points with an estimated contribution below this fraction of the mean contribution are pruned (in an unbiased way). If 0, no pruning is performed. Defaults to 0.
+        convergence_tolerance (float | None, optional): If provided, scatter points are processed in a shuffled order and the SSS kernels stop once the relative change of the sparse sinogram tails falls below this value. If None, all scatter points are used. Defaults to None.
 
     Returns:
         torch.Tensor: Estimated SSS projection data (sinogram/listmode)
@@ -520,29 +1438,45 @@ def get_sss_scatter_estimate(
     else:
         listmode = False
     print(f"[SSS] Listmode: {listmode}")
+    # Options shared by the non-TOF and TOF kernels
+    kernel_options = dict(
+        image_stepsize=image_stepsize,
+        attenuation_cutoff=attenuation_cutoff,
+        sinogram_interring_stepsize=sinogram_interring_stepsize,
+        sinogram_intraring_stepsize=sinogram_intraring_stepsize,
+        sampled_detectors_only=sampled_detectors_only,
+        memory_budget_GB=memory_budget_GB,
+        seed=seed,
+        cache_transmission_integrals=cache_transmission_integrals,
+        cache_dir=cache_dir,
+        energy_resolution=energy_resolution,
+        energy_threshhold=energy_threshhold,
+        physics_lut_size=physics_lut_size,
+        importance_sampling=importance_sampling,
+        num_scatter_points=num_scatter_points,
+        pruning_tolerance=pruning_tolerance,
+        convergence_tolerance=convergence_tolerance,
+    )
     if tof_meta is None:
         # Get sparse sinogram
         print("[SSS] Computing sparse sinogram (non-TOF)...")
         print("[SSS] Attenuation map range:", attenuation_image.min(), attenuation_image.max())
-        scatter_sinogram_sparse_unscaled = compute_sss_sparse_sinogram(object_meta, proj_meta, pet_image, attenuation_image, image_stepsize, attenuation_cutoff, sinogram_interring_stepsize, sinogram_intraring_stepsize)
+        scatter_sinogram_sparse_unscaled = compute_sss_sparse_sinogram(object_meta, proj_meta, pet_image, attenuation_image, **kernel_options)
         print(f"[SSS] Sparse sinogram shape: {scatter_sinogram_sparse_unscaled.shape}")
         print(f"[SSS] Sparse sinogram: {scatter_sinogram_sparse_unscaled}")
         # Interpolate sparse sinogram
         print("[SSS] Interpolating sparse sinogram...")
-        scatter_sinogram_unscaled  = interpolate_sparse_sinogram(scatter_sinogram_sparse_unscaled, proj_meta, *get_sample_detector_ids(proj_meta, sinogram_interring_stepsize, sinogram_intraring_stepsize)[:2])
+        scatter_sinogram_unscaled  = interpolate_sparse_sinogram(scatter_sinogram_sparse_unscaled, proj_meta, *get_sample_detector_ids(proj_meta, sinogram_interring_stepsize, sinogram_intraring_stepsize)[:2], interpolation_method)
         print(f"[SSS] Interpolated sinogram shape: {scatter_sinogram_unscaled.shape}")
         print(f"[SSS] Interpolated sinogram: {scatter_sinogram_unscaled}")
     else:
         # Get sparse sinogram
-        scatter_sinogram_sparse_unscaled = compute_sss_sparse_sinogram_TOF(object_meta, proj_meta, pet_image, attenuation_image, tof_meta, image_stepsize, attenuation_cutoff, sinogram_interring_stepsize, sinogram_intraring_stepsize, num_dense_tof_bins, N_splits)
+        scatter_sinogram_sparse_unscaled = compute_sss_sparse_sinogram_TOF(object_meta, proj_meta, pet_image, attenuation_image, tof_meta=tof_meta, num_dense_tof_bins=num_dense_tof_bins, N_splits=N_splits, **kernel_options)
         
-        scatter_sinogram_unscaled = torch.empty(scatter_sinogram_sparse_unscaled.shape, dtype=torch.float32)
-       
         print("[SSS] Computing sparse sinogram (TOF)...")
-        # Interpolate sparse sinogram (loop over TOF bins)
-        for i in range(scatter_sinogram_sparse_unscaled.shape[-1]):
-            scatter_sinogram_unscaled[...,i] = interpolate_sparse_sinogram(scatter_sinogram_sparse_unscaled[:,:,:,i], proj_meta, *get_sample_detector_ids(proj_meta, sinogram_interring_stepsize, sinogram_intraring_stepsize)[:2])
-            print(f"[SSS] Sparse TOF sinogram shape: {scatter_sinogram_sparse_unscaled.shape}")
+        print(f"[SSS] Sparse TOF sinogram shape: {scatter_sinogram_sparse_unscaled.shape}")
+        # Interpolate sparse sinogram (all TOF bins at once)
+        scatter_sinogram_unscaled = interpolate_sparse_sinogram(scatter_sinogram_sparse_unscaled, proj_meta, *get_sample_detector_ids(proj_meta, sinogram_interring_stepsize, sinogram_intraring_stepsize)[:2], interpolation_method)
     del(scatter_sinogram_sparse_unscaled) # save memory for next step
     print("[SSS] Deleted sparse sinogram to save memory.")
     